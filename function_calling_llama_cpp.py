@@ -1,43 +1,27 @@
 from llama_cpp import Llama
-llm = Llama(model_path="text-generation-webui/models/dolphin-2.5-mixtral-8x7b.Q4_K_M.gguf", chat_format="functionary")
-out = llm.create_chat_completion(
-      messages = [
-        {
-          "role": "system",
-          "content": "A chat between a curious user and an artificial intelligence assistant. The assistant gives helpful, detailed, and polite answers to the user's questions. The assistant calls functions with appropriate input when necessary"
-          
-        },
-        {
-          "role": "user",
-          "content": "Extract Jason is 25 years old"
-        }
-      ],
-      tools=[{
-        "type": "function",
-        "function": {
-          "name": "UserDetail",
-          "parameters": {
-            "type": "object",
-            "title": "UserDetail",
-            "properties": {
-              "name": {
-                "title": "Name",
-                "type": "string"
-              },
-              "age": {
-                "title": "Age",
-                "type": "integer"
-              }
+from mixtral_function_calling.backends import FunctionaryBackend
+from mixtral_function_calling.completion import JSONSchemaFunction
+from mixtral_function_calling.examples import USER_DETAIL_TOOL
+
+
+def example():
+    llm = Llama(model_path="text-generation-webui/models/dolphin-2.5-mixtral-8x7b.Q4_K_M.gguf", chat_format="functionary")
+    out = FunctionaryBackend(llm).call(
+          messages = [
+            {
+              "role": "system",
+              "content": "A chat between a curious user and an artificial intelligence assistant. The assistant gives helpful, detailed, and polite answers to the user's questions. The assistant calls functions with appropriate input when necessary"
+
             },
-            "required": [ "name", "age" ]
-          }
-        }
-      }],
-      tool_choices=[{
-        "type": "function",
-        "function": {
-          "name": "UserDetail"
-        }
-      }]
-)
-breakpoint()
\ No newline at end of file
+            {
+              "role": "user",
+              "content": "Extract Jason is 25 years old"
+            }
+          ],
+          functions=[JSONSchemaFunction(USER_DETAIL_TOOL)]
+    )
+    print(out["function_call"])
+
+
+if __name__ == "__main__":
+    example()
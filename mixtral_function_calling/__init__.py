@@ -0,0 +1,49 @@
+"""
+Grammar-constrained function calling for llama.cpp models.
+
+Importing the package is cheap: submodules, and with them pydantic and llama-cpp-python, are only imported when
+one of the attributes below is first accessed.
+"""
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    "function_call_completion": "completion",
+    "chat_template_format": "completion",
+    "PydanticFunction": "completion",
+    "JSONSchemaFunction": "completion",
+    "generate_gbnf_grammar_from_pydantic": "grammar_generator",
+    "generate_text_documentation": "grammar_generator",
+    "get_primitive_grammar": "grammar_generator",
+    "DocumentationRenderer": "documentation",
+    "generate_grammar_and_documentation": "documentation",
+    "generate_gbnf_grammar_from_json_schemas": "json_schema_grammar",
+    "Metrics": "metrics",
+    "BM25ToolIndex": "tool_selection",
+    "fit_tool_descriptions": "tool_prompt",
+    "attach_draft_model": "speculative",
+    "ToolRegistry": "tool_registry",
+    "SessionStore": "session_store",
+    "HistoryManager": "history",
+    "ResponseCache": "response_cache",
+    "GrammarBackend": "backends",
+    "FunctionaryBackend": "backends",
+    "FakeBackend": "backends",
+    "FakeLlama": "fake_llama",
+    "FakeGrammar": "fake_llama",
+    "FakeTokenizer": "fake_llama",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
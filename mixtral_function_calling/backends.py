@@ -0,0 +1,91 @@
+"""
+Engines that turn messages and functions into a parsed function call.
+
+- `GrammarBackend`: ChatML prompt with the functions in the system prompt and a generated GBNF grammar, the
+  `function_call_completion` path of `mixtral_function_call.py`.
+- `FunctionaryBackend`: llama.cpp's built-in `functionary` chat format with OpenAI style `tools`, the path of
+  `function_calling_llama_cpp.py`.
+- `FakeBackend`: the grammar path on `FakeLlama`, for tests and offline benchmarks.
+
+Every backend returns a completion dict with `usage` and a `function_call` key holding the parsed Pydantic model
+instance (a dict for `JSONSchemaFunction`s), or None if the output did not parse. `compare_backends` in
+`benchmark` runs the same workload through several backends.
+"""
+import json
+from typing import List, Optional
+
+from .completion import function_call_completion, match_function_call
+
+
+class FunctionCallingBackend:
+    """Interface of all backends."""
+    name = "backend"
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def call(self, messages: List[dict], functions: list, sampling: Optional[dict] = None) -> dict:
+        raise NotImplementedError
+
+
+class GrammarBackend(FunctionCallingBackend):
+    """
+    :param llm: A `Llama` (or `FakeLlama`) without a chat format.
+    :param grammar_factory: See `function_call_completion`.
+    :param completion_kwargs: Further arguments of `function_call_completion`, e.g. `tool_token_budget`.
+    """
+    name = "grammar"
+
+    def __init__(self, llm, grammar_factory=None, **completion_kwargs):
+        super().__init__(llm)
+        self.grammar_factory = grammar_factory
+        self.completion_kwargs = completion_kwargs
+
+    def call(self, messages, functions, sampling=None):
+        return function_call_completion(self.llm, messages, functions, grammar_factory=self.grammar_factory,
+                                        sampling=sampling, **self.completion_kwargs)
+
+
+class FunctionaryBackend(FunctionCallingBackend):
+    """
+    :param llm: A `Llama` created with `chat_format="functionary"`, or a `FakeLlama`.
+
+    Example Usage:
+    ```
+    llm = Llama(model_path="functionary-7b-v1.Q4_K.gguf", chat_format="functionary")
+    response = FunctionaryBackend(llm).call(messages, [JSONSchemaFunction(tool)])
+    ```
+    """
+    name = "functionary"
+
+    def call(self, messages, functions, sampling=None):
+        tools = [{"type": "function", "function": function.openapi_json} for function in functions]
+        tool_choice = {"type": "function", "function": {"name": functions[0].name}} if len(functions) == 1 \
+            else "auto"
+        completion = self.llm.create_chat_completion(messages=[dict(message) for message in messages], tools=tools,
+                                                     tool_choice=tool_choice, **(sampling or {}))
+        completion["function_call"] = parse_tool_call(completion["choices"][0]["message"], functions)
+        return completion
+
+
+def parse_tool_call(message: dict, functions: list):
+    """Parse the first tool call (or legacy `function_call`) of a chat message with the function it names."""
+    tool_calls = message.get("tool_calls") or []
+    call = tool_calls[0]["function"] if tool_calls else message.get("function_call")
+    if not call:
+        return None
+    named = [function for function in functions if function.name == call.get("name")]
+    arguments = call.get("arguments") or ""
+    if not isinstance(arguments, str):
+        arguments = json.dumps(arguments)
+    return match_function_call(arguments, named)[1]
+
+
+class FakeBackend(GrammarBackend):
+    """The grammar path on a `FakeLlama`, a default one if `llm` is not given."""
+    name = "fake"
+
+    def __init__(self, llm=None, **completion_kwargs):
+        from .fake_llama import FakeGrammar, FakeLlama
+        completion_kwargs.setdefault("grammar_factory", FakeGrammar.from_string)
+        super().__init__(llm or FakeLlama(), **completion_kwargs)
@@ -0,0 +1,256 @@
+"""
+Offline latency benchmark for function calling.
+
+Runs `function_call_completion` against `FakeLlama` for a few tool sets and reports token counts, the share of
+generated tokens that the grammar forced, and simulated time to first token. Usage:
+
+    python -m mixtral_function_calling.benchmark --vocab path/to/tokenizer.json --samples 20
+
+With `--nested-schemas`, it instead measures grammar generation for deeply nested and recursive schemas. With
+`--compare-backends`, it runs the same workload through the grammar and the functionary backends and reports
+latency, tokens, the share of valid function calls and memory, on fake models or with `--model` on llama.cpp.
+"""
+import argparse
+import gc
+import json
+import os
+import time
+import tracemalloc
+from statistics import mean, quantiles
+from typing import List, Optional
+
+from pydantic import create_model
+
+from .backends import FakeBackend, FunctionCallingBackend, FunctionaryBackend, GrammarBackend
+from .completion import JSONSchemaFunction, PydanticFunction, function_call_completion
+from .examples import (USER_DETAIL_TOOL, AddCoreMemoryModel, CmdCommandModel, FileListModel,
+                       PythonInterpreterCommandModel, ReadFileModel, RemoveCoreMemoryModel, ReplaceCoreMemoryModel,
+                       SearchEventMemoryModel, SendMessageToUser, WebBrowsingModel, WriteFileSectionModel,
+                       WriteOutlineModel)
+from .fake_llama import FakeGrammar, FakeLlama, FakeTokenizer
+from .grammar_generator import generate_gbnf_grammar_from_pydantic, get_model_fields, get_reachable_models
+from .speculative import attach_draft_model
+from .tool_selection import BM25ToolIndex
+
+SYSTEM_PROMPT = "A chat between a curious user and an artificial intelligence assistant. The assistant gives helpful, detailed, and polite answers to the user's questions. The assistant calls functions with appropriate input when necessary"
+
+TOOL_SETS = {
+    "single": [SendMessageToUser],
+    "file-tools": [ReadFileModel, FileListModel, WriteFileSectionModel],
+    "agent": [SendMessageToUser, CmdCommandModel, WebBrowsingModel, PythonInterpreterCommandModel,
+              WriteFileSectionModel, ReadFileModel, FileListModel, AddCoreMemoryModel, ReplaceCoreMemoryModel,
+              RemoveCoreMemoryModel, SearchEventMemoryModel],
+}
+
+
+def benchmark_tool_set(llm, models, samples=10, user_message="List the files in the current folder please",
+                       tool_token_budget=None, top_k=None):
+    """
+    Run `samples` completions for one tool set and return averaged metrics.
+    """
+    functions = [PydanticFunction(model) for model in models]
+    tool_index = BM25ToolIndex(functions) if top_k else None
+    stats = []
+    for _ in range(samples):
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_message},
+        ]
+        # Every sample pays the full prefill, prefix reuse across samples would hide the prompt cost.
+        llm.reset()
+        function_call_completion(llm, messages, functions, grammar_factory=FakeGrammar.from_string,
+                                 tool_token_budget=tool_token_budget, tool_index=tool_index, top_k=top_k)
+        stats.append(llm.last_stats)
+    result = {
+        "tools": len(models),
+        "prompt_tokens": mean(s.prompt_tokens for s in stats),
+        "generated_tokens": mean(s.completion_tokens for s in stats),
+        "forced_literal_share": mean(s.forced_literal_share for s in stats),
+        "simulated_ttft_s": mean(s.simulated_time_to_first_token for s in stats),
+        "simulated_total_s": mean(s.simulated_total_time for s in stats),
+    }
+    if llm.draft_model is not None:
+        proposed = sum(s.draft_proposed_tokens for s in stats)
+        result["draft_acceptance_rate"] = sum(s.draft_accepted_tokens for s in stats) / proposed if proposed else 0.0
+        result["verification_steps"] = mean(s.verification_steps for s in stats)
+    return result
+
+
+def run_benchmark(llm, tool_sets=None, samples=10, tool_token_budget=None, top_k=None):
+    tool_sets = tool_sets or TOOL_SETS
+    return {name: benchmark_tool_set(llm, models, samples, tool_token_budget=tool_token_budget, top_k=top_k)
+            for name, models in tool_sets.items()}
+
+
+def nested_chain_model(depth: int):
+    """A model nesting `depth` levels of distinct models, each with a scalar field and a list of the next level."""
+    level = create_model(f"Level{depth}", value=(str, ...))
+    for index in reversed(range(depth)):
+        level = create_model(f"Level{index}", value=(str, ...), children=(List[level], ...), first=(level, ...))
+    return level
+
+
+def benchmark_grammar_generation(models, max_depth=None, repeat=5):
+    """Best-of-`repeat` time to generate the grammar from scratch, with the reflection caches cleared."""
+    timings = []
+    for _ in range(repeat):
+        get_model_fields.cache_clear()
+        get_reachable_models.cache_clear()
+        start = time.perf_counter()
+        grammar = generate_gbnf_grammar_from_pydantic(models, max_depth=max_depth)
+        timings.append(time.perf_counter() - start)
+    return {"seconds": min(timings), "rules": grammar.count("::="), "grammar_bytes": len(grammar)}
+
+
+def run_nested_schema_benchmark(depths=(4, 16, 64), max_depths=(None, 2, 4, 8), repeat=5):
+    results = {}
+    for depth in depths:
+        results[f"chain-{depth}"] = benchmark_grammar_generation([nested_chain_model(depth)], repeat=repeat)
+    for max_depth in max_depths:
+        results[f"outline-max-depth-{max_depth}"] = benchmark_grammar_generation([WriteOutlineModel], max_depth,
+                                                                                 repeat)
+    return results
+
+
+def backend_workload():
+    """One request per tool set, plus the UserDetail extraction of `function_calling_llama_cpp.py`."""
+    workload = {}
+    for name, models in TOOL_SETS.items():
+        messages = [{"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": "List the files in the current folder please"}]
+        workload[name] = (messages, [PydanticFunction(model) for model in models])
+    workload["user-detail"] = ([{"role": "system", "content": SYSTEM_PROMPT},
+                                {"role": "user", "content": "Extract Jason is 25 years old"}],
+                               [JSONSchemaFunction(USER_DETAIL_TOOL)])
+    return workload
+
+
+def resident_memory() -> Optional[int]:
+    """Resident set size of this process in bytes, None where `/proc/self/statm` is not available."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def benchmark_backend(backend, workload, samples=10, sampling=None, rss_baseline=None):
+    """
+    Run every request of `workload` `samples` times through `backend`, each with a cold KV cache. Python memory is
+    traced in one extra pass, so tracing does not distort the latencies.
+
+    Native memory, e.g. the weights and KV cache of llama.cpp, is only visible in the resident set size. It is
+    sampled after every request and reported as the peak increase over `rss_baseline`, by default the resident set
+    size before the first request. `compare_backends` takes the baseline before creating the backend, so loading
+    the model is included.
+    """
+    if rss_baseline is None:
+        rss_baseline = resident_memory()
+    rss_peak = rss_baseline
+
+    def run_all():
+        nonlocal rss_peak
+        for messages, functions in workload.values():
+            if hasattr(backend.llm, "reset"):
+                backend.llm.reset()
+            start = time.perf_counter()
+            completion = backend.call(messages, functions, sampling)
+            latency = time.perf_counter() - start
+            rss = resident_memory()
+            if rss is not None:
+                rss_peak = max(rss_peak, rss)
+            yield latency, completion, getattr(backend.llm, "last_stats", None)
+
+    runs = [run for _ in range(samples) for run in run_all()]
+    tracemalloc.start()
+    for _ in run_all():
+        pass
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = [latency for latency, _, _ in runs]
+    result = {
+        "requests": len(runs),
+        "latency_s": mean(latencies),
+        "latency_p95_s": quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0],
+        "prompt_tokens": mean(completion["usage"]["prompt_tokens"] for _, completion, _ in runs),
+        "completion_tokens": mean(completion["usage"]["completion_tokens"] for _, completion, _ in runs),
+        "validity_rate": mean(float(completion["function_call"] is not None) for _, completion, _ in runs),
+        "python_peak_mb": python_peak / 2 ** 20,
+    }
+    if rss_baseline is not None:
+        result["rss_increase_mb"] = (rss_peak - rss_baseline) / 2 ** 20
+    if all(stats is not None for _, _, stats in runs):
+        result["simulated_total_s"] = mean(stats.simulated_total_time for _, _, stats in runs)
+    return result
+
+
+def compare_backends(backends: dict, workload=None, samples=10, sampling=None):
+    """
+    Benchmark each of the named `backends` on the same workload, see `benchmark_backend`. A backend can also be
+    given as a function that creates it. It is then created right before its run and released afterwards, so only
+    one model is loaded at a time, and its resident memory is measured from before it is created, including the
+    loading of the model.
+    """
+    workload = workload or backend_workload()
+    results = {}
+    for name, backend in backends.items():
+        # The previous backend is no longer referenced, collect it so its memory is not counted against this one.
+        gc.collect()
+        rss_baseline = resident_memory()
+        if not isinstance(backend, FunctionCallingBackend):
+            backend = backend()
+        results[name] = benchmark_backend(backend, workload, samples, sampling, rss_baseline)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vocab", help="tokenizer.json or one-token-per-line vocab file")
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefill-seconds-per-token", type=float, default=0.002)
+    parser.add_argument("--decode-seconds-per-token", type=float, default=0.05)
+    parser.add_argument("--tool-token-budget", type=int, help="token budget for the tool descriptions")
+    parser.add_argument("--top-k", type=int, help="only offer the k most relevant tools")
+    parser.add_argument("--draft-tokens", type=int, help="decode speculatively with a fake draft model")
+    parser.add_argument("--nested-schemas", action="store_true",
+                        help="benchmark grammar generation for nested and recursive schemas instead")
+    parser.add_argument("--compare-backends", action="store_true",
+                        help="compare the grammar and the functionary backends instead")
+    parser.add_argument("--model", help="GGUF model for --compare-backends, fake models are used by default")
+    args = parser.parse_args()
+
+    if args.nested_schemas:
+        print(json.dumps(run_nested_schema_benchmark(), indent=4))
+        return
+    tokenizer = FakeTokenizer.from_file(args.vocab) if args.vocab else FakeTokenizer.bytes_only()
+    if args.compare_backends:
+        sampling = {"temperature": 0.0}
+        if args.model:
+            from llama_cpp import Llama
+            backends = {"grammar": lambda: GrammarBackend(Llama(model_path=args.model, verbose=False)),
+                        "functionary": lambda: FunctionaryBackend(Llama(model_path=args.model,
+                                                                        chat_format="functionary", verbose=False))}
+        else:
+            def fake_llama():
+                return FakeLlama(tokenizer=tokenizer, seed=args.seed,
+                                 prefill_seconds_per_token=args.prefill_seconds_per_token,
+                                 decode_seconds_per_token=args.decode_seconds_per_token)
+            backends = {"grammar": FakeBackend(fake_llama()), "functionary": FunctionaryBackend(fake_llama())}
+        print(json.dumps(compare_backends(backends, samples=args.samples, sampling=sampling), indent=4))
+        return
+
+    llm = FakeLlama(tokenizer=tokenizer, seed=args.seed,
+                    prefill_seconds_per_token=args.prefill_seconds_per_token,
+                    decode_seconds_per_token=args.decode_seconds_per_token)
+    if args.draft_tokens:
+        draft = FakeLlama(tokenizer=tokenizer, seed=args.seed + 1,
+                          decode_seconds_per_token=args.decode_seconds_per_token / 10)
+        attach_draft_model(llm, draft, num_pred_tokens=args.draft_tokens)
+    print(json.dumps(run_benchmark(llm, samples=args.samples, tool_token_budget=args.tool_token_budget,
+                                   top_k=args.top_k), indent=4))
+
+
+if __name__ == "__main__":
+    main()
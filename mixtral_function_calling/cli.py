@@ -0,0 +1,98 @@
+"""
+Command line interface, installed as `mixtral-fc`.
+
+    mixtral-fc compile my_tools:SearchModel my_tools:WriteModel -o tools.gbnf --documentation tools.md
+    mixtral-fc compile --json-schema tools.json -o tools.gbnf
+    mixtral-fc import-time mixtral_function_calling.completion --max-seconds 0.5
+
+`compile` precompiles grammars ahead of time, load them with `function_call_completion(grammar_text=...)`.
+`import-time` measures the cold import time of a module in fresh interpreters and fails above a threshold, so
+it can guard the start-up time of workers in CI.
+"""
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+
+
+def load_object(path: str):
+    """Import `package.module:Name`."""
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        raise argparse.ArgumentTypeError(f"Expected module:Name, got {path}")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def compile_grammar(args) -> int:
+    from .grammar_generator import (generate_gbnf_grammar_from_pydantic, generate_text_documentation,
+                                    get_primitive_grammar, remove_empty_lines)
+
+    if args.json_schema:
+        from .json_schema_grammar import generate_gbnf_grammar_from_json_schemas
+        with open(args.json_schema) as file:
+            tools = json.load(file)
+        grammar = generate_gbnf_grammar_from_json_schemas(tools, args.root_rule_class, args.root_rule_content)
+        models = []
+    else:
+        if not args.models:
+            print("Either models or --json-schema are required", file=sys.stderr)
+            return 2
+        models = [load_object(path) for path in args.models]
+        grammar = generate_gbnf_grammar_from_pydantic(models, args.root_rule_class, args.root_rule_content)
+    grammar = remove_empty_lines(grammar)
+    with open(args.output, "w") as file:
+        file.write(grammar + get_primitive_grammar(grammar))
+    if args.documentation:
+        if not models:
+            print("--documentation requires Pydantic models", file=sys.stderr)
+            return 2
+        with open(args.documentation, "w") as file:
+            file.write(generate_text_documentation(models, "Output Model", "Output Fields"))
+    return 0
+
+
+def measure_import_time(module: str, repeat: int = 5) -> float:
+    """Best-of-`repeat` wall time of `import module` in a fresh interpreter, in seconds."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def import_time(args) -> int:
+    seconds = measure_import_time(args.module, args.repeat)
+    print(f"{args.module}: {seconds * 1000:.1f} ms")
+    if args.max_seconds is not None and seconds > args.max_seconds:
+        print(f"Import takes longer than {args.max_seconds * 1000:.1f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="mixtral-fc", description="Grammar-constrained function calling tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = subparsers.add_parser("compile", help="precompile a GBNF grammar for a set of tools")
+    compile_parser.add_argument("models", nargs="*", help="Pydantic models as module:Name")
+    compile_parser.add_argument("--json-schema", help="JSON file with a list of tools given as JSON Schema")
+    compile_parser.add_argument("-o", "--output", default="./generated_grammar.gbnf")
+    compile_parser.add_argument("--documentation", help="also write the text documentation of the models")
+    compile_parser.add_argument("--root-rule-class")
+    compile_parser.add_argument("--root-rule-content")
+    compile_parser.set_defaults(handler=compile_grammar)
+
+    import_parser = subparsers.add_parser("import-time", help="measure the cold import time of a module")
+    import_parser.add_argument("module", nargs="?", default="mixtral_function_calling")
+    import_parser.add_argument("--repeat", type=int, default=5)
+    import_parser.add_argument("--max-seconds", type=float)
+    import_parser.set_defaults(handler=import_time)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
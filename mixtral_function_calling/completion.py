@@ -0,0 +1,347 @@
+from inspect import isclass
+from pydantic import BaseModel
+from .grammar_generator import generate_gbnf_grammar_from_pydantic, get_primitive_grammar
+from .json_schema_grammar import generate_gbnf_grammar_from_json_schemas, tool_parameters_schema
+from .metrics import DEFAULT_METRICS, RATE_BUCKETS, TOKEN_BUCKETS
+from .tool_prompt import fit_tool_descriptions, render_tool_descriptions
+from collections import OrderedDict
+import json
+import time
+
+
+
+class PydanticFunction:
+    """
+    Wraps a Pydantic model as a function that `function_call_completion` can offer to the model.
+    """
+    def __init__(self, model, name=None, description=None):
+        self.name = name or model.__name__
+        self.parameters_openapi = model
+        self.openapi_json = {
+            "name": self.name,
+            "description": description or (model.__doc__ or "").strip(),
+            "parameters": model.model_json_schema(),
+        }
+
+
+class JSONSchemaFunction:
+    """
+    A function defined by JSON Schema, e.g. an entry of an OpenAI style `tools` list. Its grammar is compiled
+    directly from the schema and the parsed function call is a dict of arguments.
+    """
+    def __init__(self, tool):
+        spec = tool["function"] if tool.get("type") == "function" and "function" in tool else tool
+        self.name = spec["name"]
+        self.openapi_json = spec
+        self.parameters_openapi = None
+        self.parameters_schema = tool_parameters_schema(spec)
+
+
+def is_pydantic_function(function):
+    return isclass(function.parameters_openapi) and issubclass(function.parameters_openapi, BaseModel)
+
+
+def format_system_prompt_addition(functions, tool_descriptions=None):
+    """
+    The text `chat_template_format` appends to the first system message. `tool_descriptions` replaces the
+    default indented JSON of every function, see `tool_prompt.fit_tool_descriptions`.
+    """
+    system_prompt_addition = "\n\nYou have access to the following functions:\n"
+    if tool_descriptions is None:
+        tool_descriptions = render_tool_descriptions(functions)
+    system_prompt_addition += tool_descriptions
+    system_prompt_addition += "\nRespond in the following syntax:\n"
+    system_prompt_addition += "<function_call> ...arguments </function_call>\n"
+    return system_prompt_addition
+
+
+def format_chat_message(message, system_prompt_addition=""):
+    """
+    Render one message in ChatML, with its function call if it has one. `system_prompt_addition` is appended to
+    the content, `chat_template_format` passes it for the first system message.
+    """
+    content = (message.get('content') or "") + system_prompt_addition
+    if message.get('function_call'):
+        content += f"""\n<function_call> {json.dumps(message['function_call'], indent=4)}</function_call>"""
+    return f"""<|im_start|>{message['role']}
+{content}<|im_end|>"""
+
+
+def chat_template_format(messages, functions, tool_descriptions=None):
+    """
+    Render messages in ChatML and add the functions to the system prompt, see `format_system_prompt_addition`.
+    The messages are not modified, so the same list can be extended and rendered again with an identical prefix.
+    """
+    text = ""
+    system_prompt_addition = format_system_prompt_addition(functions, tool_descriptions)
+    for message in messages:
+        if message['role'] == 'system':
+            text += format_chat_message(message, system_prompt_addition)
+            system_prompt_addition = ""
+        else:
+            text += format_chat_message(message)
+    return text
+
+
+
+_grammar_text_cache = OrderedDict()
+_compiled_grammar_cache = OrderedDict()
+GRAMMAR_CACHE_SIZE = 64
+
+
+def _cached(cache, key, build):
+    """Return `(value, hit)` from a small LRU dict, building and inserting the value on a miss."""
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key], True
+    value = build()
+    cache[key] = value
+    if len(cache) > GRAMMAR_CACHE_SIZE:
+        cache.popitem(last=False)
+    return value, False
+
+
+def grammar_cache_key(functions):
+    """Pydantic tools are keyed by their classes, tools given as JSON Schema by their canonical JSON."""
+    if all(is_pydantic_function(f) for f in functions):
+        return tuple(f.parameters_openapi for f in functions)
+    return json.dumps([f.openapi_json for f in functions], sort_keys=True)
+
+
+def build_grammar_text(functions):
+    """
+    Generate the grammar from the Pydantic models, or directly from the JSON Schemas if any function is not
+    backed by a Pydantic model.
+    """
+    if all(is_pydantic_function(f) for f in functions):
+        grammar_text = generate_gbnf_grammar_from_pydantic([f.parameters_openapi for f in functions])
+    else:
+        grammar_text = generate_gbnf_grammar_from_json_schemas([f.openapi_json for f in functions])
+    return grammar_text + get_primitive_grammar(grammar_text)
+
+
+def match_function_call(text, functions):
+    """
+    Parse the generated arguments with the first function that accepts them. Pydantic functions return a
+    model instance, JSON Schema functions a dict whose keys match the schema.
+
+    :return: Tuple of the matching function and the parsed arguments, or (None, None).
+    """
+    text = text.strip()
+    if text.endswith("</function_call>"):
+        text = text[:-len("</function_call>")]
+    arguments = None
+    for function in functions:
+        if is_pydantic_function(function):
+            try:
+                return function, function.parameters_openapi.model_validate_json(text)
+            except ValueError:
+                continue
+        if arguments is None:
+            try:
+                arguments = json.loads(text)
+            except ValueError:
+                arguments = False
+        if not isinstance(arguments, dict):
+            continue
+        schema = getattr(function, "parameters_schema", None) or tool_parameters_schema(function.openapi_json)
+        properties = schema.get("properties", {})
+        if set(schema.get("required", [])) <= set(arguments) <= set(properties):
+            return function, arguments
+    return None, None
+
+
+def parse_function_call(text, functions):
+    """
+    Parse the generated arguments, see `match_function_call`. Returns None if no function accepts the text.
+    """
+    return match_function_call(text, functions)[1]
+
+
+def generated_tokens(llm, prompt_tokens, text, finish_reason):
+    """
+    The tokens `llm` sampled after `prompt_tokens`: the ones it evaluated, plus the last sampled token, which
+    llama.cpp never evaluates. That is the end of sequence token, or the last text token if generation stopped at
+    `max_tokens`. Unlike tokenizing `text` again, this gives the tokens that were actually sampled.
+    """
+    from .session_store import evaluated_tokens
+    tokens = evaluated_tokens(llm)[len(prompt_tokens):]
+    if finish_reason == "stop":
+        return tokens + [llm.token_eos()]
+    # The unevaluated last token is what tokenizing the whole text adds to tokenizing the evaluated part, so that a
+    # leading space the tokenizer puts in front of a standalone string cancels out.
+    evaluated_text = llm.detokenize(tokens).decode("utf-8", errors="ignore")
+    if text.startswith(evaluated_text) and len(text) > len(evaluated_text):
+        evaluated_part = llm.tokenize(evaluated_text.encode("utf-8"), add_bos=False)
+        whole = llm.tokenize(text.encode("utf-8"), add_bos=False)
+        if whole[:len(evaluated_part)] == evaluated_part:
+            tokens += whole[len(evaluated_part):]
+    return tokens
+
+
+def function_call_completion(llm, messages, functions, grammar_factory=None, metrics=None, tool_token_budget=None,
+                             tool_index=None, top_k=None, grammar_text=None, session_store=None, session_id=None,
+                             history=None, sampling=None, response_cache=None, grammar=None):
+    """
+    1. Generate grammer for the functions
+    2. Format messages using chat template, add functions to system prompt
+    3. generate completion
+
+    `grammar_text` skips grammar generation, e.g. for a grammar precompiled with `mixtral-fc compile` for the
+    same functions in the same order. `grammar` additionally skips compilation, it must be `grammar_text` compiled
+    for `llm`, e.g. by `tool_registry.ToolRegistry` in the background.
+
+    `grammar_factory` compiles the grammar text, it defaults to `LlamaGrammar.from_string`. Pass
+    `FakeGrammar.from_string` together with a `FakeLlama` to run without llama.cpp.
+
+    With `tool_index` (see `tool_selection.BM25ToolIndex`) and `top_k`, only the `top_k` of `functions` most
+    relevant to the conversation are put into the prompt and the grammar.
+
+    With `tool_token_budget`, the tools are described in the richest format whose token count fits the budget
+    (indented JSON, compact JSON, text documentation or signatures only).
+
+    If `llm.draft_model` is a `speculative.GrammarDraftModel`, arguments are decoded speculatively and the draft
+    acceptance counts are recorded per called tool.
+
+    With `history` (see `history.HistoryManager`), old turns are folded so the prompt stays within its token
+    budget while the pinned system prompt and the recent turns are rendered verbatim.
+
+    `sampling` holds sampling parameters passed to the model, e.g. `{"temperature": 0.0}`. With `response_cache`
+    (see `response_cache.ResponseCache`), deterministic requests whose prompt, grammar and sampling parameters
+    were seen before are answered from the cache without calling the model.
+
+    With `session_store` (see `session_store.SessionStore`) and `session_id`, the model state of the session is
+    restored before and saved after the call, so a session resumed on another worker or after a restart only
+    evaluates the tokens of its new turn.
+
+    Every stage is timed into `metrics` (default: `metrics.DEFAULT_METRICS`). The returned completion dict has
+    an additional `function_call` key with the parsed Pydantic model instance (a dict of arguments for
+    `JSONSchemaFunction`s), or None if parsing failed.
+    """
+    metrics = metrics or DEFAULT_METRICS
+    if grammar_factory is None and grammar is None:
+        from llama_cpp.llama import LlamaGrammar
+        grammar_factory = LlamaGrammar.from_string
+    if tool_index is not None and top_k is not None:
+        with metrics.stage("tool_selection"):
+            functions = tool_index.select(messages, top_k, functions)
+        metrics.observe("selected_tools", len(functions), buckets=TOKEN_BUCKETS)
+    if grammar_text is None:
+        with metrics.stage("grammar_generation"):
+            grammar_text, hit = _cached(_grammar_text_cache, grammar_cache_key(functions),
+                                        lambda: build_grammar_text(functions))
+        metrics.record_cache("grammar_text", hit)
+    metrics.set_gauge("grammar_size_bytes", len(grammar_text))
+    if grammar is None:
+        with metrics.stage("grammar_compilation"):
+            grammar, hit = _cached(_compiled_grammar_cache, (grammar_factory, grammar_text),
+                                   lambda: grammar_factory(grammar_text))
+        metrics.record_cache("compiled_grammar", hit)
+
+    with metrics.stage("tool_descriptions"):
+        if tool_token_budget is not None:
+            tool_descriptions, description_format, description_tokens = fit_tool_descriptions(
+                functions, llm, tool_token_budget)
+            metrics.increment("tool_description_format_total", labels={"format": description_format})
+            metrics.observe("tool_description_tokens", description_tokens, buckets=TOKEN_BUCKETS)
+        else:
+            tool_descriptions = render_tool_descriptions(functions)
+
+    if history is not None:
+        with metrics.stage("history_folding"):
+            # Folded against the system prompt as rendered, tool descriptions included.
+            messages = history.fit(messages, format_system_prompt_addition(functions, tool_descriptions))
+        metrics.set_gauge("history_folded_messages", history.folded_messages)
+        metrics.observe("history_tokens", history.last_tokens, buckets=TOKEN_BUCKETS)
+
+    with metrics.stage("prompt_formatting"):
+        chat_text = chat_template_format(
+            messages=messages,
+            functions=functions,
+            tool_descriptions=tool_descriptions
+        )
+        chat_text += "\n\n<|im_start|>assistant\n<function_call> "
+    cache_key = None
+    if response_cache is not None and response_cache.cacheable(sampling):
+        with metrics.stage("response_cache_lookup"):
+            cache_key = response_cache.key(chat_text, grammar_text, sampling)
+            cached = response_cache.get(cache_key)
+        metrics.record_cache("response", cached is not None)
+        if cached is not None:
+            with metrics.stage("parsing"):
+                cached["function_call"] = parse_function_call(cached["choices"][0]["text"], functions)
+            return cached
+
+    with metrics.stage("tokenization"):
+        prompt_tokens = llm.tokenize(chat_text.encode("utf-8"))
+    metrics.observe("prompt_tokens", len(prompt_tokens), buckets=TOKEN_BUCKETS)
+
+    if session_store is not None and session_id is not None:
+        from .session_store import evaluated_tokens
+        with metrics.stage("session_restore"):
+            session_store.restore(session_id, llm)
+        reused_tokens = 0
+        for evaluated, prompt_token in zip(evaluated_tokens(llm), prompt_tokens):
+            if evaluated != prompt_token:
+                break
+            reused_tokens += 1
+        metrics.observe("reused_prompt_tokens", reused_tokens, buckets=TOKEN_BUCKETS)
+
+    draft_model = getattr(llm, "draft_model", None)
+    if hasattr(draft_model, "begin"):
+        draft_model.begin(len(prompt_tokens), grammar_text)
+
+    start = time.perf_counter()
+    chunks = llm(
+        prompt_tokens,
+        grammar=grammar, max_tokens=-1, stream=True, **(sampling or {})
+    )
+    first_chunk = next(chunks, None)
+    prompt_done = time.perf_counter()
+    parts = [first_chunk] if first_chunk is not None else []
+    parts.extend(chunks)
+    decode_done = time.perf_counter()
+    prompt_seconds = prompt_done - start
+    decode_seconds = decode_done - prompt_done
+    metrics.observe("stage_seconds", prompt_seconds, {"stage": "prompt_evaluation"})
+    metrics.observe("stage_seconds", decode_seconds, {"stage": "decode"})
+    if prompt_seconds > 0:
+        metrics.observe("prompt_tokens_per_second", len(prompt_tokens) / prompt_seconds, buckets=RATE_BUCKETS)
+    if decode_seconds > 0 and len(parts) > 1:
+        metrics.observe("decode_tokens_per_second", (len(parts) - 1) / decode_seconds, buckets=RATE_BUCKETS)
+    metrics.observe("completion_tokens", len(parts), buckets=TOKEN_BUCKETS)
+
+    text = "".join(part["choices"][0]["text"] for part in parts)
+    if session_store is not None and session_id is not None:
+        with metrics.stage("session_save"):
+            session_store.save(session_id, chat_text + text, llm)
+    with metrics.stage("parsing"):
+        called_function, function_call = match_function_call(text, functions)
+    metrics.increment("function_calls_total", labels={"valid": str(function_call is not None).lower()})
+    if hasattr(draft_model, "finish"):
+        tool = getattr(called_function, "name", None) or "unknown"
+        finish_reason = parts[-1]["choices"][0]["finish_reason"] if parts else "stop"
+        draft_model.finish(tool, generated_tokens(llm, prompt_tokens, text, finish_reason))
+        metrics.increment("draft_proposed_tokens_total", draft_model.proposed, labels={"tool": tool})
+        metrics.increment("draft_accepted_tokens_total", draft_model.accepted, labels={"tool": tool})
+    completion = {
+        "id": parts[0]["id"] if parts else None,
+        "object": "text_completion",
+        "created": parts[0]["created"] if parts else int(time.time()),
+        "model": parts[0]["model"] if parts else None,
+        "choices": [{
+            "text": text,
+            "index": 0,
+            "logprobs": None,
+            "finish_reason": parts[-1]["choices"][0]["finish_reason"] if parts else "stop",
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt_tokens),
+            "completion_tokens": len(parts),
+            "total_tokens": len(prompt_tokens) + len(parts),
+        },
+        "function_call": function_call,
+    }
+    if cache_key is not None and function_call is not None:
+        response_cache.put(cache_key, completion)
+    return completion
@@ -0,0 +1,204 @@
+"""
+Render the documentation of Pydantic models as text for the system prompt or as a markdown report.
+
+The same tools are documented on every request, so the renderer caches the fragment of every model and of every
+field and only joins them. Models are reflected with `grammar_generator.get_model_fields`, the cache the grammar
+generator uses as well, so `generate_grammar_and_documentation` reflects each model once for both outputs.
+"""
+import json
+import weakref
+from inspect import getdoc, isclass
+from typing import IO, Any, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from .grammar_generator import (format_model_and_field_name, generate_gbnf_grammar_from_pydantic, get_model_fields,
+                                remove_empty_lines)
+
+DOCUMENTATION_FORMATS = ("text", "markdown")
+
+
+def type_name(field_type: Any) -> str:
+    return getattr(field_type, "__name__", None) or str(field_type)
+
+
+def model_description(model: Type[BaseModel]) -> str:
+    class_doc = getdoc(model)
+    return class_doc if class_doc and class_doc != getdoc(BaseModel) else "No specific description available."
+
+
+def model_example(model: Type[BaseModel]) -> Optional[dict]:
+    config = getattr(model, "Config", None)
+    json_schema_extra = getattr(config, "json_schema_extra", None)
+    if isinstance(json_schema_extra, dict) and "example" in json_schema_extra:
+        return json_schema_extra["example"]
+    return None
+
+
+def format_multiline_description(description: str, indent_level: int) -> str:
+    indent = '    ' * indent_level
+    return indent + description.replace('\n', '\n' + indent)
+
+
+class _FieldFragments:
+    """The field fragments of a model nested inside some ancestors, and the deeper paths by their next ancestor."""
+    __slots__ = ("fragments", "nested")
+
+    def __init__(self):
+        self.fragments = {}
+        self.nested = weakref.WeakKeyDictionary()
+
+
+class DocumentationRenderer:
+    """
+    Renders and caches the documentation of models in one format.
+
+    :param format: "text" (the format of `generate_text_documentation`) or "markdown" (`generate_markdown_report`).
+    :param model_prefix: Heading of each model in the text format.
+    :param fields_prefix: Heading of the fields in the text format.
+
+    Nested models are documented inline. A model that contains itself is expanded once per branch, deeper occurrences
+    refer to the enclosing documentation.
+
+    Example Usage:
+    ```
+    renderer = DocumentationRenderer(model_prefix="Output Model", fields_prefix="Output Fields")
+    with open("tools.md", "w") as file:
+        renderer.write([SendMessageToUser, ReadFileModel], file)
+    ```
+    """
+
+    def __init__(self, format: str = "text", model_prefix: str = "Model", fields_prefix: str = "Fields"):
+        if format not in DOCUMENTATION_FORMATS:
+            raise ValueError(f"Unknown documentation format: {format}")
+        self.format = format
+        self.model_prefix = model_prefix
+        self.fields_prefix = fields_prefix
+        # Weak keys, so that models which are redefined (e.g. reloaded) do not keep their fragments alive. Field
+        # fragments are keyed by the model and then by each ancestor in turn, so no key or value refers to a model
+        # strongly.
+        self._model_fragments = weakref.WeakKeyDictionary()
+        self._field_fragments = weakref.WeakKeyDictionary()
+
+    def model_fragment(self, model: Type[BaseModel]) -> str:
+        fragment = self._model_fragments.get(model)
+        if fragment is None:
+            render = self._render_markdown_model if self.format == "markdown" else self._render_text_model
+            fragment = self._model_fragments[model] = "".join(render(model))
+        return fragment
+
+    def field_fragment(self, model: Type[BaseModel], field_name: str, field_type: Any, field_info,
+                       ancestors: Tuple[Type[BaseModel], ...] = ()) -> str:
+        """The documentation of one field of `model`, nested inside the models in `ancestors`."""
+        node = self._field_fragments.setdefault(model, _FieldFragments())
+        for ancestor in ancestors:
+            node = node.nested.setdefault(ancestor, _FieldFragments())
+        fragment = node.fragments.get(field_name)
+        if fragment is None:
+            render = self._render_markdown_field if self.format == "markdown" else self._render_text_field
+            fragment = node.fragments[field_name] = "".join(render(model, field_name, field_type, field_info,
+                                                                   ancestors))
+        return fragment
+
+    def iter_fragments(self, models: List[Type[BaseModel]]) -> Iterator[str]:
+        for model in models:
+            yield self.model_fragment(model)
+
+    def render(self, models: List[Type[BaseModel]]) -> str:
+        return "".join(self.iter_fragments(models))
+
+    def write(self, models: List[Type[BaseModel]], file: IO[str]):
+        """Stream the documentation to a file or buffer, model by model."""
+        for fragment in self.iter_fragments(models):
+            file.write(fragment)
+
+    def clear(self):
+        self._model_fragments.clear()
+        self._field_fragments.clear()
+
+    def _nested_fields(self, field_type: Any, ancestors: Tuple[Type[BaseModel], ...]) -> Optional[list]:
+        if not (isclass(field_type) and issubclass(field_type, BaseModel)):
+            return None
+        return [(field_type, name, annotation, field_info)
+                for name, annotation, field_info in get_model_fields(field_type)]
+
+    def _render_text_model(self, model: Type[BaseModel]) -> Iterator[str]:
+        model_name = format_model_and_field_name(model.__name__)
+        yield f"{self.model_prefix}: {model_name}\n"
+        yield "  Description: \n" + format_multiline_description(model_description(model), 2) + "\n\n"
+        yield f"  {self.fields_prefix}:\n"
+        for name, annotation, field_info in get_model_fields(model):
+            yield self.field_fragment(model, name, annotation, field_info, (model,))
+        yield "\n"
+        example = model_example(model)
+        if example is not None:
+            yield f"  Expected Example Output for {model_name}:\n"
+            yield format_multiline_description(json.dumps(example), 2) + "\n"
+
+    def _render_text_field(self, model, field_name, field_type, field_info, ancestors) -> Iterator[str]:
+        indent = '    ' * (2 * len(ancestors) - 1)
+        yield f"{indent}{field_name} ({type_name(field_type)}): \n"
+        description = field_info.description if field_info and field_info.description else "No description available."
+        yield f"{indent}  Description: {description}\n"
+        example = model_example(model)
+        if example is not None and example.get(field_name) is not None:
+            field_example = example[field_name]
+            example_text = f"'{field_example}'" if isinstance(field_example, str) else field_example
+            yield f"{indent}  Example: {example_text}\n"
+        if field_type in ancestors:
+            yield f"{indent}  Details: see {format_model_and_field_name(field_type.__name__)} above\n"
+            return
+        nested_fields = self._nested_fields(field_type, ancestors)
+        if nested_fields is not None:
+            yield f"{indent}  Details:\n"
+            for nested_model, name, annotation, nested_info in nested_fields:
+                yield self.field_fragment(nested_model, name, annotation, nested_info, ancestors + (nested_model,))
+
+    def _render_markdown_model(self, model: Type[BaseModel]) -> Iterator[str]:
+        yield f"### {format_model_and_field_name(model.__name__)}\n"
+        yield f"{model_description(model)}\n\n"
+        yield "#### Fields\n"
+        for name, annotation, field_info in get_model_fields(model):
+            yield self.field_fragment(model, name, annotation, field_info, (model,))
+        yield "\n"
+
+    def _render_markdown_field(self, model, field_name, field_type, field_info, ancestors) -> Iterator[str]:
+        depth = 2 * len(ancestors) - 1
+        indent = '  ' * depth
+        # Only the fields of the documented model itself have formatted names.
+        name = format_model_and_field_name(field_name) if depth == 1 else field_name
+        description = field_info.description if field_info and field_info.description else "No description available."
+        yield f"{indent}- **{name}** (`{type_name(field_type)}`): {description}\n"
+        if field_type in ancestors:
+            yield f"{indent}  - Details: see {format_model_and_field_name(field_type.__name__)} above\n"
+            return
+        nested_fields = self._nested_fields(field_type, ancestors)
+        if nested_fields is not None:
+            yield f"{indent}  - Details:\n"
+            for nested_model, name, annotation, nested_info in nested_fields:
+                yield self.field_fragment(nested_model, name, annotation, nested_info, ancestors + (nested_model,))
+
+
+_renderers = {}
+
+
+def get_renderer(format: str = "text", model_prefix: str = "Model", fields_prefix: str = "Fields"):
+    """The shared renderer, and with it the fragment cache, for a format and its headings."""
+    key = (format, model_prefix, fields_prefix)
+    if key not in _renderers:
+        _renderers[key] = DocumentationRenderer(format, model_prefix, fields_prefix)
+    return _renderers[key]
+
+
+def generate_grammar_and_documentation(models: List[Type[BaseModel]], root_rule_class: str = None,
+                                       root_rule_content: str = None, model_prefix: str = "Output Model",
+                                       fields_prefix: str = "Output Fields",
+                                       max_depth: Optional[int] = None) -> Tuple[str, str]:
+    """
+    Generate the grammar and the text documentation of `models` from one reflection of each model.
+
+    :return: Tuple of the grammar without empty lines and the documentation.
+    """
+    grammar = generate_gbnf_grammar_from_pydantic(models, root_rule_class, root_rule_content, max_depth=max_depth)
+    documentation = get_renderer("text", model_prefix, fields_prefix).render(models)
+    return remove_empty_lines(grammar), documentation
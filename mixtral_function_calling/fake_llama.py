@@ -0,0 +1,390 @@
+"""
+A fake, CPU-only stand-in for `llama_cpp.Llama` that can be passed to `function_call_completion`.
+
+Text is produced either from a script or by sampling random sentences from the GBNF grammar, and it is tokenized
+with a real tokenizer vocabulary so that token counts match what the real model would see. Time is simulated
+from per-token prefill and decode costs instead of being measured, which keeps benchmarks deterministic.
+"""
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Union
+
+from .grammar_recognizer import ParsedGrammar, forced_mask, random_sentence
+
+
+class FakeTokenizer:
+    """
+    Greedy longest-match tokenizer over a vocabulary.
+
+    This is not byte-pair encoding, but on the vocabularies of BPE / SentencePiece models it produces token counts
+    that are close to the real ones, which is all a latency benchmark needs.
+    """
+
+    def __init__(self, vocab: Dict[str, int], bos_token_id: int = 1, eos_token_id: int = 2):
+        self.vocab = vocab
+        self.id_to_token = {i: t for t, i in vocab.items()}
+        self.bos_token_id = bos_token_id
+        self.eos_token_id = eos_token_id
+        self.max_token_length = max((len(t) for t in vocab), default=1)
+        self.byte_tokens = {}
+        next_id = max(vocab.values(), default=-1) + 1
+        for b in range(256):
+            token_id = vocab.get(f"<0x{b:02X}>")
+            if token_id is None:
+                token_id = next_id + b
+                self.id_to_token[token_id] = f"<0x{b:02X}>"
+            self.byte_tokens[b] = token_id
+
+    @classmethod
+    def from_file(cls, path: str) -> "FakeTokenizer":
+        """
+        Load a vocabulary from a Hugging Face `tokenizer.json`, a JSON object mapping tokens to ids, or a text
+        file with one token per line. SentencePiece word boundaries (`▁`) are mapped to spaces.
+        """
+        with open(path, encoding="utf-8") as file:
+            content = file.read()
+        if path.endswith(".json"):
+            data = json.loads(content)
+            raw_vocab = data["model"]["vocab"] if "model" in data else data
+        else:
+            raw_vocab = {line: i for i, line in enumerate(content.split("\n")) if line}
+        vocab = {}
+        for token, token_id in raw_vocab.items():
+            vocab.setdefault(token.replace("▁", " "), token_id)
+        return cls(vocab, bos_token_id=vocab.get("<s>", 1), eos_token_id=vocab.get("</s>", 2))
+
+    @classmethod
+    def bytes_only(cls) -> "FakeTokenizer":
+        """A vocabulary of the 256 byte tokens only, used when no vocab file is given."""
+        return cls({"<s>": 1, "</s>": 2})
+
+    def encode(self, text: str) -> List[int]:
+        tokens = []
+        i = 0
+        while i < len(text):
+            for length in range(min(self.max_token_length, len(text) - i), 0, -1):
+                token_id = self.vocab.get(text[i:i + length])
+                if token_id is not None:
+                    tokens.append(token_id)
+                    i += length
+                    break
+            else:
+                tokens.extend(self.byte_tokens[b] for b in text[i].encode("utf-8"))
+                i += 1
+        return tokens
+
+    def decode(self, tokens: Iterable[int]) -> bytes:
+        out = b""
+        for token_id in tokens:
+            token = self.id_to_token.get(token_id, "")
+            if token.startswith("<0x") and token.endswith(">") and len(token) == 6:
+                out += bytes([int(token[3:5], 16)])
+            elif token_id not in (self.bos_token_id, self.eos_token_id):
+                out += token.encode("utf-8")
+        return out
+
+    def token_lengths(self, text: str) -> List[int]:
+        """Number of characters covered by each token of `encode(text)` (byte tokens of one char share it)."""
+        lengths = []
+        i = 0
+        while i < len(text):
+            for length in range(min(self.max_token_length, len(text) - i), 0, -1):
+                if text[i:i + length] in self.vocab:
+                    lengths.append(length)
+                    i += length
+                    break
+            else:
+                n_bytes = len(text[i].encode("utf-8"))
+                lengths.extend([1] + [0] * (n_bytes - 1))
+                i += 1
+        return lengths
+
+
+class FakeGrammar:
+    """Drop-in for `LlamaGrammar` when used with `FakeLlama`."""
+
+    def __init__(self, grammar_text: str):
+        self.grammar_text = grammar_text
+        self.parsed = ParsedGrammar.from_string(grammar_text)
+
+    @classmethod
+    def from_string(cls, grammar: str, verbose: bool = True) -> "FakeGrammar":
+        return cls(grammar)
+
+
+@dataclass
+class FakeCompletionStats:
+    prompt_tokens: int
+    completion_tokens: int
+    forced_tokens: int
+    simulated_time_to_first_token: float
+    simulated_total_time: float
+    cached_prompt_tokens: int = 0
+    draft_proposed_tokens: int = 0
+    draft_accepted_tokens: int = 0
+    verification_steps: int = 0
+
+    @property
+    def forced_literal_share(self) -> float:
+        """Share of generated tokens whose characters were all fixed by the grammar."""
+        return self.forced_tokens / self.completion_tokens if self.completion_tokens else 0.0
+
+
+@dataclass
+class FakeLlamaState:
+    """Mirrors the fields of `llama_cpp.LlamaState`, `llama_state` stands in for the serialized KV cache."""
+    input_ids: List[int]
+    scores: Optional[object]
+    n_tokens: int
+    llama_state: bytes
+    llama_state_size: int
+    seed: int
+
+
+class FakeLlama:
+    """
+    Fake `Llama` that is callable like the real one and returns completion dicts in the same format.
+
+    :param tokenizer: Tokenizer used for prompt and completion token accounting.
+    :param script: Optional list of completions returned in order. Scripted completions are validated against
+        the grammar when one is given.
+    :param seed: Seed for the random grammar policy used when no script is given.
+    :param mean_repeat: Average number of repetitions the random policy picks for `*` and `+` in the grammar.
+    :param prefill_seconds_per_token: Simulated cost of evaluating one prompt token.
+    :param decode_seconds_per_token: Simulated cost of generating one token.
+
+    When `draft_model` is set (see `speculative.attach_draft_model`), decoding is simulated speculatively: the draft
+    proposes tokens, the longest prefix that matches the target's own output is accepted, and every verification
+    batch costs one decode step.
+
+    Like `Llama`, the fake keeps the tokens it has evaluated and only pays prefill for the part of a prompt that
+    does not share a prefix with them. `save_state` / `load_state` carry that prefix across instances.
+    """
+
+    state_class = FakeLlamaState
+
+    def __init__(self, tokenizer: Optional[FakeTokenizer] = None, script: Optional[List[str]] = None,
+                 seed: int = 0, mean_repeat: float = 6.0, n_ctx: int = 32768,
+                 prefill_seconds_per_token: float = 0.002, decode_seconds_per_token: float = 0.05):
+        self.tokenizer = tokenizer or FakeTokenizer.bytes_only()
+        self.script = list(script) if script else []
+        self.rng = random.Random(seed)
+        self.mean_repeat = mean_repeat
+        self._n_ctx = n_ctx
+        self.prefill_seconds_per_token = prefill_seconds_per_token
+        self.decode_seconds_per_token = decode_seconds_per_token
+        self.model_path = "fake"
+        self.last_stats: Optional[FakeCompletionStats] = None
+        self.draft_model = None
+        self.input_ids: List[int] = []
+        self._draft_prompt_length = 0
+        self._draft_reference = ""
+
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.input_ids)
+
+    def reset(self):
+        self.input_ids = []
+
+    def save_state(self) -> FakeLlamaState:
+        # Roughly the size of a KV cache entry per token, so snapshot sizes behave like real ones.
+        llama_state = bytes(64 * len(self.input_ids))
+        return FakeLlamaState(input_ids=list(self.input_ids), scores=None, n_tokens=len(self.input_ids),
+                              llama_state=llama_state, llama_state_size=len(llama_state), seed=0)
+
+    def load_state(self, state: FakeLlamaState):
+        self.input_ids = [int(token) for token in state.input_ids[:state.n_tokens]]
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        tokens = self.tokenizer.encode(text.decode("utf-8"))
+        return [self.tokenizer.bos_token_id] + tokens if add_bos else tokens
+
+    def detokenize(self, tokens: List[int]) -> bytes:
+        return self.tokenizer.decode(tokens)
+
+    def token_eos(self) -> int:
+        return self.tokenizer.eos_token_id
+
+    def begin(self, prompt_length: int, grammar_text: Optional[str] = None):
+        """
+        Called by `GrammarDraftModel` when this fake is used as a draft: pick the completion this draft believes
+        in, from the script or sampled from the grammar, and continue towards it in `generate`.
+        """
+        self._draft_prompt_length = prompt_length
+        parsed = FakeGrammar(grammar_text).parsed if grammar_text is not None else None
+        self._draft_reference = self._generate_text(parsed) if self.script or parsed is not None else ""
+
+    def generate(self, tokens: List[int], **kwargs):
+        """
+        Yield continuation tokens like `Llama.generate`. The continuation follows the draft reference from the
+        longest suffix of the output so far that occurs in it.
+        """
+        output = self.detokenize(list(tokens)[self._draft_prompt_length:]).decode("utf-8", errors="ignore")
+        reference = self._draft_reference
+        start = len(output) if reference.startswith(output) else 0
+        if not start:
+            for length in range(min(len(output), 32), 0, -1):
+                index = reference.find(output[-length:])
+                if index >= 0:
+                    start = index + length
+                    break
+        yield from self.tokenizer.encode(reference[start:])
+
+    def _simulate_speculative_decoding(self, prompt: List[int], completion: List[int]):
+        """Return (verification steps, proposed tokens, accepted tokens, draft seconds)."""
+        steps = proposed = accepted = 0
+        position = 0
+        while position < len(completion):
+            proposal = [int(token) for token in self.draft_model(prompt + completion[:position])]
+            matched = 0
+            for token, expected in zip(proposal, completion[position:]):
+                if token != expected:
+                    break
+                matched += 1
+            proposed += len(proposal)
+            accepted += matched
+            position += matched + 1
+            steps += 1
+        draft_llm = getattr(self.draft_model, "draft_llm", None)
+        draft_seconds = proposed * getattr(draft_llm, "decode_seconds_per_token", 0.0)
+        return steps, proposed, accepted, draft_seconds
+
+    def _generate_text(self, grammar: Optional[ParsedGrammar]) -> str:
+        if self.script:
+            return self.script.pop(0)
+        if grammar is None:
+            raise ValueError("FakeLlama needs either a script or a grammar to generate text")
+        return random_sentence(grammar, self.rng, mean_repeat=self.mean_repeat)
+
+    def __call__(self, prompt: Union[str, List[int]], grammar: Union[FakeGrammar, str, None] = None,
+                 max_tokens: int = 16, stream: bool = False, **kwargs):
+        if isinstance(grammar, str):
+            grammar = FakeGrammar(grammar)
+        parsed = grammar.parsed if grammar is not None else None
+
+        if isinstance(prompt, str):
+            prompt = self.tokenize(prompt.encode("utf-8"))
+        prompt = list(prompt)
+        prompt_tokens = len(prompt)
+        cached_prompt_tokens = 0
+        for cached, token in zip(self.input_ids, prompt):
+            if cached != token:
+                break
+            cached_prompt_tokens += 1
+        # The last prompt token is always evaluated to get logits, as in llama.cpp.
+        cached_prompt_tokens = max(min(cached_prompt_tokens, prompt_tokens - 1), 0)
+        text = self._generate_text(parsed)
+        mask = forced_mask(parsed, text) if parsed is not None else [False] * len(text)
+
+        forced_tokens = 0
+        token_texts = []
+        offset = 0
+        for length in self.tokenizer.token_lengths(text):
+            if length == 0:
+                continue
+            token_texts.append(text[offset:offset + length])
+            forced_tokens += all(mask[offset:offset + length])
+            offset += length
+        finish_reason = "stop"
+        max_tokens = self._n_ctx - prompt_tokens if max_tokens is None or max_tokens <= 0 else max_tokens
+        if len(token_texts) > max_tokens:
+            token_texts = token_texts[:max_tokens]
+            finish_reason = "length"
+        text = "".join(token_texts)
+        completion = self.tokenizer.encode(text)
+        completion_tokens = len(completion)
+
+        self.input_ids = prompt + completion
+        ttft = (prompt_tokens - cached_prompt_tokens) * self.prefill_seconds_per_token + self.decode_seconds_per_token
+        steps, proposed, accepted, draft_seconds = completion_tokens, 0, 0, 0.0
+        if self.draft_model is not None:
+            steps, proposed, accepted, draft_seconds = self._simulate_speculative_decoding(prompt, completion)
+        self.last_stats = FakeCompletionStats(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_prompt_tokens=cached_prompt_tokens,
+            forced_tokens=min(forced_tokens, completion_tokens),
+            simulated_time_to_first_token=ttft,
+            simulated_total_time=ttft + max(steps - 1, 0) * self.decode_seconds_per_token + draft_seconds,
+            draft_proposed_tokens=proposed,
+            draft_accepted_tokens=accepted,
+            verification_steps=steps,
+        )
+        completion_id = f"cmpl-{uuid.uuid4()}"
+        created = int(time.time())
+        if stream:
+            return self._stream(completion_id, created, token_texts, finish_reason)
+        return {
+            "id": completion_id,
+            "object": "text_completion",
+            "created": created,
+            "model": self.model_path,
+            "choices": [{"text": text, "index": 0, "logprobs": None, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def create_chat_completion(self, messages: List[dict], tools: Optional[List[dict]] = None, tool_choice=None,
+                               **kwargs):
+        """
+        Chat completion with `tools`, like `Llama.create_chat_completion` with the `functionary` chat format. The
+        prompt lists the tool definitions before the messages, and the arguments of the chosen tool are sampled from
+        the grammar of its JSON Schema (or taken from the script).
+        """
+        from .grammar_generator import get_primitive_grammar
+        from .json_schema_grammar import generate_gbnf_grammar_from_json_schemas
+
+        tools = tools or []
+        if isinstance(tool_choice, dict):
+            tool = next(t for t in tools if t["function"]["name"] == tool_choice["function"]["name"])
+        elif tools:
+            tool = tools[self.rng.randrange(len(tools))]
+        else:
+            raise ValueError("FakeLlama.create_chat_completion needs tools")
+        name = tool["function"]["name"]
+        prompt = "// Supported function definitions\n" + "".join(
+            f"{json.dumps(t['function'])}\n" for t in tools)
+        prompt += "".join(f"{m['role']}:\n{m.get('content') or ''}\n" for m in messages)
+        prompt += f"assistant to=functions.{name}:\n"
+        grammar_text = generate_gbnf_grammar_from_json_schemas([tool])
+        grammar = FakeGrammar(grammar_text + get_primitive_grammar(grammar_text))
+        completion = self(prompt, grammar=grammar, max_tokens=-1)
+        arguments = completion["choices"][0]["text"]
+        return {
+            "id": completion["id"].replace("cmpl-", "chatcmpl-"),
+            "object": "chat.completion",
+            "created": completion["created"],
+            "model": self.model_path,
+            "choices": [{
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+                                    "function": {"name": name, "arguments": arguments}}],
+                },
+                "finish_reason": "tool_calls",
+            }],
+            "usage": completion["usage"],
+        }
+
+    def _stream(self, completion_id, created, token_texts, finish_reason):
+        for i, token_text in enumerate(token_texts):
+            yield {
+                "id": completion_id,
+                "object": "text_completion",
+                "created": created,
+                "model": self.model_path,
+                "choices": [{"text": token_text, "index": 0, "logprobs": None,
+                             "finish_reason": finish_reason if i == len(token_texts) - 1 else None}],
+            }
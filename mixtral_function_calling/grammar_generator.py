@@ -1,18 +1,16 @@
 """Original source: https://gist.githubusercontent.com/Maximilian-Winter/5373962ef456a2b0d1ae324fb78e623e/raw/8d4bcaecb55e30edd645086422697887d93283f9/gbnf_grammar_generator.py"""
+import functools
+import hashlib
 import inspect
-import json
 import re
-import typing
-from inspect import isclass, getdoc
+from inspect import isclass
 from types import NoneType
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 from pydantic.fields import FieldInfo
 from typing import Any, Type, List, get_args, get_origin, Tuple, Union, Optional
 from enum import Enum
 
-import re
-
 
 class PydanticDataType(Enum):
     """
@@ -90,6 +88,242 @@ def generate_list_rule(element_type):
     return list_rule
 
 
+def format_object_rule(rule_name: str, field_rules: List[Tuple[str, str]], optional_fields=frozenset()) -> str:
+    """
+    Generate a GBNF rule for a JSON object with the given fields, in order.
+
+    :param rule_name: Name of the rule.
+    :param field_rules: List of (field name, GBNF rule of the value) tuples.
+    :param optional_fields: Names of the fields that are not required and may be left out.
+    :return: A string representing the GBNF rule for the object.
+    """
+    model_rule_parts = [f'\"\\\"{field_name}\\\"\" ":" ws {rule}' for field_name, rule in field_rules]
+    if not any(field_name in optional_fields for field_name, _ in field_rules):
+        fields_joined = ' ws ", " ws '.join(model_rule_parts)
+        return f'{rule_name} ::= "{{" ws {fields_joined} ws "}}"'
+    optional = [field_name in optional_fields for field_name, _ in field_rules]
+
+    def following_fields(start: int) -> str:
+        return "".join(f' (ws ", " ws {part})?' if is_optional else f' ws ", " ws {part}'
+                       for part, is_optional in zip(model_rule_parts[start:], optional[start:]))
+
+    # One alternative per field that can come first: each optional field up to the first required one.
+    alternatives = []
+    for index, (part, is_optional) in enumerate(zip(model_rule_parts, optional)):
+        alternatives.append(part + following_fields(index + 1))
+        if not is_optional:
+            break
+    fields_joined = alternatives[0] if len(alternatives) == 1 else f"({' | '.join(alternatives)})"
+    if all(optional):
+        return f'{rule_name} ::= "{{" ws ({fields_joined} ws)? "}}"'
+    return f'{rule_name} ::= "{{" ws {fields_joined} ws "}}"'
+
+
+def format_enum_rule(rule_name: str, values: List[Any]) -> str:
+    """Generate a GBNF rule that matches one of the given values as JSON strings."""
+    enum_values = [f'\"\\\"{value}\\\"\"' for value in values]  # Adding escaped quotes
+    return f"{rule_name} ::= {' | '.join(enum_values)}"
+
+
+def enum_rule_name(enum_name: str, values: List[Any]) -> str:
+    """
+    Name of the rule shared by every field of the enum class `enum_name`. The name includes a hash of the values, so
+    two enums with the same class name but different values (e.g. from different modules) get different rules.
+    """
+    values_hash = hashlib.sha1(repr(list(values)).encode("utf-8")).hexdigest()[:8]
+    return f"enum-{format_model_and_field_name(enum_name)}-{values_hash}"
+
+
+def pool_rules(rules: List[str], created_rules: dict) -> List[str]:
+    """
+    Drop the rules that were already emitted for another field, so a rule defined by its content alone, like the
+    alternation of an enum class or the digits of a number constraint, appears once in the grammar however many
+    fields and models use it.
+
+    :raises ValueError: If a rule of the same name was emitted with a different definition.
+    """
+    pooled = []
+    for rule in rules:
+        rule_name = rule.split("::=", 1)[0].strip()
+        existing = created_rules.get(("rule", rule_name))
+        if existing is None:
+            created_rules[("rule", rule_name)] = rule
+            pooled.append(rule)
+        elif existing != rule:
+            raise ValueError(f"Conflicting definitions of the grammar rule {rule_name!r}: {existing!r} and {rule!r}")
+    return pooled
+
+
+def claim_model_rule(rule_name: str, model, model_label: str, created_rules: dict):
+    """
+    Record that the rule `rule_name` describes `model`. The rule name is derived from the model's name alone, so
+    distinct models of the same name, e.g. `paint.Color` and `light.Color`, would otherwise share one rule.
+
+    :raises ValueError: If the rule already describes a different model.
+    """
+    existing = created_rules.setdefault(("model", rule_name), (model, model_label))
+    if existing[0] is not model and existing[0] != model:
+        raise ValueError(f"The models {existing[1]!r} and {model_label!r} both map to the grammar rule {rule_name!r}, "
+                         f"rename one of them")
+
+
+def format_array_rule(rule_name: str, element_rule: Optional[str], allow_empty: bool = False) -> str:
+    """
+    Generate a GBNF rule for a non-empty JSON array of `element_rule`, or for the empty array if the elements are cut
+    off by a depth bound (`element_rule` is None). Arrays of recursive models must `allow_empty`, otherwise the
+    recursion never ends.
+    """
+    if element_rule is None:
+        return f'{rule_name} ::= "[" ws "]"'
+    if allow_empty:
+        return f"""{rule_name} ::= "[" ws ({element_rule} ("," ws {element_rule})*)? ws "]" """
+    return f"""{rule_name} ::= "[" ws {element_rule} ("," ws {element_rule})* ws "]" """
+
+
+def format_dict_rule(rule_name: str, value_rule: Optional[str], key_rule: str = "string") -> str:
+    """Generate a GBNF rule for a JSON object with arbitrary keys, empty if the values are cut off by a depth bound."""
+    if value_rule is None:
+        return f'{rule_name} ::= "{{" ws "}}"'
+    return fr'{rule_name} ::= "{{" ws ( {key_rule} ":" ws {value_rule} ("," ws {key_rule} ":" ws {value_rule})* )? ws "}}"'
+
+
+def format_union_rule(rule_name: str, member_rules: List[str], nullable: bool = False) -> Tuple[str, str]:
+    """
+    Generate a GBNF rule for a union. A nullable union also matches `null`, a nullable union with a single member
+    (e.g. `Optional[str]`) is named as optional.
+
+    :return: Tuple of the name of the generated rule and the rule itself.
+    """
+    if nullable:
+        union_rule_name = f"{rule_name}-optional" if len(member_rules) == 1 else f"{rule_name}-union"
+        member_rules = [*member_rules, '"null"']
+    else:
+        union_rule_name = f"{rule_name}-union"
+    return union_rule_name, f"{union_rule_name} ::= {' | '.join(member_rules)}"
+
+
+def format_root_rules(model_rule_names: List[str], root_rule_class: str = None, root_rule_content: str = None) -> str:
+    """
+    Generate the root rule(s) that select one of the models, see `generate_gbnf_grammar_from_pydantic`.
+    """
+    if root_rule_class is None:
+        return "root ::= " + " | ".join(model_rule_names)
+    root_rule = f"root ::= {format_model_and_field_name(root_rule_class)}\n"
+
+    model_rule = fr'{format_model_and_field_name(root_rule_class)} ::= "{{" ws "\"{root_rule_class}\"" ":" ws grammar-models ws "}}"'
+    fields_joined = " | ".join([fr'{model_rule_name}-grammar-model' for model_rule_name in model_rule_names])
+
+    grammar_model_rules = f'\ngrammar-models ::= {fields_joined}'
+    mod_rules = []
+    for model_rule_name in model_rule_names:
+        mod_rule = fr'{model_rule_name}-grammar-model ::= '
+        mod_rule += fr'"\"{model_rule_name}\"" "," "\"{root_rule_content}\"" ":"  {model_rule_name}' + '\n'
+        mod_rules.append(mod_rule)
+    grammar_model_rules += "\n" + "\n".join(mod_rules)
+    return root_rule + model_rule + grammar_model_rules
+
+
+def digit_bounds(minimum=None, maximum=None) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Translate numeric bounds into (max_digit, min_digit) for the integer part. GBNF can not express numeric
+    ranges cheaply, so only non-negative bounds are approximated by their number of digits.
+    """
+    max_digit = len(str(int(maximum))) if maximum is not None and maximum >= 0 else None
+    min_digit = len(str(int(minimum))) if minimum is not None and minimum > 0 else None
+    return max_digit, min_digit
+
+
+def generate_gbnf_number_rules(is_float: bool, constraints: dict) -> Tuple[str, list]:
+    """
+    Generate the rule for a constrained integer or float.
+
+    :param is_float: Whether the number is a float.
+    :param constraints: Dict with optional `max_digit`, `min_digit`, `max_precision`, `min_precision`, `minimum`
+        and `maximum` keys. Explicit digit counts take precedence over bounds.
+    :return: Tuple containing the rule name and a list of additional rules.
+    """
+    max_digit, min_digit = digit_bounds(constraints.get('minimum'), constraints.get('maximum'))
+    if constraints.get('max_digit') is not None:
+        max_digit = constraints['max_digit']
+    if constraints.get('min_digit') is not None:
+        min_digit = constraints['min_digit']
+    if is_float:
+        return generate_gbnf_float_rules(max_digit=max_digit, min_digit=min_digit,
+                                         max_precision=constraints.get('max_precision'),
+                                         min_precision=constraints.get('min_precision'))
+    return generate_gbnf_integer_rules(max_digit=max_digit, min_digit=min_digit)
+
+
+def get_number_constraints(field_info) -> Optional[dict]:
+    """
+    Collect the number constraints of a Pydantic field from its extra arguments (e.g. `max_digit`) and its
+    `ge` / `gt` / `le` / `lt` bounds. Returns None if the field has neither.
+    """
+    if field_info is None:
+        return None
+    json_schema_extra = getattr(field_info, 'json_schema_extra', None)
+    constraints = dict(json_schema_extra) if isinstance(json_schema_extra, dict) else None
+    for metadata in getattr(field_info, 'metadata', []):
+        for key, bound in (('ge', 'minimum'), ('gt', 'minimum'), ('le', 'maximum'), ('lt', 'maximum')):
+            if getattr(metadata, key, None) is not None:
+                constraints = constraints if constraints is not None else {}
+                constraints.setdefault(bound, getattr(metadata, key))
+    return constraints
+
+
+# Bounded, since the caches hold the model classes, and a tool registry that reloads its modules creates new ones.
+MODEL_REFLECTION_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=MODEL_REFLECTION_CACHE_SIZE)
+def get_model_fields(model: Type[BaseModel]) -> Tuple[Tuple[str, Any, FieldInfo], ...]:
+    """
+    The fields of a Pydantic model as (name, annotation, field info) tuples, reflected once per model. Unlike the raw
+    `__annotations__`, this includes inherited fields and resolves forward references such as `List["Node"]`.
+    """
+    if not model.__pydantic_complete__:
+        model.model_rebuild()
+    return tuple((name, field.annotation, field) for name, field in model.model_fields.items())
+
+
+def get_nested_models(annotation) -> List[Type[BaseModel]]:
+    """The Pydantic models an annotation refers to, e.g. `Node` for `Optional[List[Node]]`."""
+    if isclass(annotation) and issubclass(annotation, BaseModel):
+        return [annotation]
+    return [model for argument in get_args(annotation) for model in get_nested_models(argument)]
+
+
+@functools.lru_cache(maxsize=MODEL_REFLECTION_CACHE_SIZE)
+def get_reachable_models(model: Type[BaseModel]) -> frozenset:
+    """All models nested in `model` at any depth. It contains `model` itself iff the model is recursive."""
+    reachable = set()
+    stack = [model]
+    while stack:
+        for _, annotation, _ in get_model_fields(stack.pop()):
+            for nested in get_nested_models(annotation):
+                if nested not in reachable:
+                    reachable.add(nested)
+                    stack.append(nested)
+    return frozenset(reachable)
+
+
+def is_recursive_model(model: Type[BaseModel]) -> bool:
+    return model in get_reachable_models(model)
+
+
+def get_model_rule_name(model: Type[BaseModel], depth: int = 0, max_depth: Optional[int] = None) -> str:
+    """
+    Name of the rule of `model` nested at `depth`. With a depth bound, models that are or contain recursive models
+    get one rule per depth, so that the recursion can be cut off at `max_depth`.
+    """
+    rule_name = format_model_and_field_name(model.__name__)
+    if max_depth is None or depth == 0:
+        return rule_name
+    if not any(is_recursive_model(nested) for nested in get_reachable_models(model) | {model}):
+        return rule_name
+    return f"{rule_name}-depth{depth}"
+
+
 def get_members_structure(cls, rule_name):
     if issubclass(cls, Enum):
         # Handle Enum types
@@ -156,8 +390,9 @@ def generate_gbnf_integer_rules(max_digit=None, min_digit=None):
     """
     additional_rules = []
 
-    # Define the rule identifier based on max_digit and min_digit
-    integer_rule = "integer-part"
+    # Define the rule identifier based on max_digit and min_digit. It differs from the `integer-part-...` rules of
+    # floats, so an integer and a float field with the same bounds never define the same rule twice.
+    integer_rule = "integer"
     if max_digit is not None:
         integer_rule += f"-max{max_digit}"
     if min_digit is not None:
@@ -165,22 +400,15 @@ def generate_gbnf_integer_rules(max_digit=None, min_digit=None):
 
     # Handling Integer Rules
     if max_digit is not None or min_digit is not None:
-        # Start with an empty rule part
-        integer_rule_part = ''
-
-        # Add mandatory digits as per min_digit
-        if min_digit is not None:
-            integer_rule_part += '[0-9] ' * min_digit
+        # At least one mandatory digit, so the rule never matches the empty string
+        mandatory_digits = max(min_digit if min_digit is not None else 1, 1)
+        integer_rule_part = '[0-9] ' * mandatory_digits
 
         # Add optional digits up to max_digit
         if max_digit is not None:
-            optional_digits = max_digit - (min_digit if min_digit is not None else 0)
-            integer_rule_part += ''.join(['[0-9]? ' for _ in range(optional_digits)])
+            integer_rule_part += '[0-9]? ' * max(max_digit - mandatory_digits, 0)
 
-        # Trim the rule part and append it to additional rules
-        integer_rule_part = integer_rule_part.strip()
-        if integer_rule_part:
-            additional_rules.append(f'{integer_rule} ::= {integer_rule_part}')
+        additional_rules.append(f'{integer_rule} ::= {integer_rule_part.strip()}')
 
     return integer_rule, additional_rules
 
@@ -245,8 +473,8 @@ def generate_gbnf_float_rules(max_digit=None, min_digit=None, max_precision=None
 
 
 def generate_gbnf_rule_for_type(model_name, field_name, field_type, is_optional, processed_models, created_rules,
-                                field_info=None) -> \
-        Tuple[str, list]:
+                                field_info=None, depth=0, max_depth=None) -> \
+        Tuple[Optional[str], list]:
     """
     Generate GBNF rule for a given field type.
 
@@ -257,8 +485,11 @@ def generate_gbnf_rule_for_type(model_name, field_name, field_type, is_optional,
     :param processed_models: List of processed models.
     :param created_rules: List of created rules.
     :param field_info: Additional information about the field (optional).
+    :param depth: Nesting depth of the model the field belongs to.
+    :param max_depth: Maximum nesting depth of recursive models, None for unbounded recursion.
 
-    :return: Tuple containing the GBNF type and a list of additional rules.
+    :return: Tuple containing the GBNF type and a list of additional rules. The GBNF type is None if the field refers
+        to a recursive model nested deeper than `max_depth`.
     :rtype: Tuple[str, list]
     """
     rules = []
@@ -267,63 +498,61 @@ def generate_gbnf_rule_for_type(model_name, field_name, field_type, is_optional,
     gbnf_type = map_pydantic_type_to_gbnf(field_type)
 
     if isclass(field_type) and issubclass(field_type, BaseModel):
-        nested_model_name = format_model_and_field_name(field_type.__name__)
-        nested_model_rules = generate_gbnf_grammar(field_type, processed_models, created_rules)
+        if max_depth is not None and depth >= max_depth and is_recursive_model(field_type):
+            return None, []
+        nested_model_rules = generate_gbnf_grammar(field_type, processed_models, created_rules, depth + 1, max_depth)
         rules.extend(nested_model_rules)
-        gbnf_type, rules = nested_model_name, rules
+        gbnf_type, rules = get_model_rule_name(field_type, depth + 1, max_depth), rules
     elif isclass(field_type) and issubclass(field_type, Enum):
-        enum_values = [f'\"\\\"{e.value}\\\"\"' for e in field_type]  # Adding escaped quotes
-        enum_rule = f"{model_name}-{field_name} ::= {' | '.join(enum_values)}"
-        rules.append(enum_rule)
-        gbnf_type, rules = model_name + "-" + field_name, rules
+        values = [e.value for e in field_type]
+        gbnf_type = enum_rule_name(field_type.__name__, values)
+        rules = pool_rules([format_enum_rule(gbnf_type, values)], created_rules)
     elif get_origin(field_type) == list:  # Array
         element_type = get_args(field_type)[0]
         element_rule_name, additional_rules = generate_gbnf_rule_for_type(model_name, f"{field_name}-element",
                                                                           element_type, is_optional, processed_models,
-                                                                          created_rules)
+                                                                          created_rules, depth=depth,
+                                                                          max_depth=max_depth)
         rules.extend(additional_rules)
-        array_rule = f"""{model_name}-{field_name} ::= "[" ws {element_rule_name} ("," ws {element_rule_name})* ws "]" """
+        array_rule = format_array_rule(f"{model_name}-{field_name}", element_rule_name,
+                                       allow_empty=any(map(is_recursive_model, get_nested_models(element_type))))
         rules.append(array_rule)
         gbnf_type, rules = model_name + "-" + field_name, rules
     elif gbnf_type.startswith("custom-class-"):
         nested_model_rules, field_types = get_members_structure(field_type, gbnf_type)
         rules.append(nested_model_rules)
     elif gbnf_type.startswith("custom-dict-"):
-        key_type, value_type = get_args(field_type)
-
-        additional_key_type, additional_key_rules = generate_gbnf_rule_for_type(model_name, f"{field_name}-key-type",
-                                                                                key_type, is_optional, processed_models,
-                                                                                created_rules)
+        # Keys are always strings in JSON.
+        value_type = get_args(field_type)[1]
         additional_value_type, additional_value_rules = generate_gbnf_rule_for_type(model_name,
                                                                                     f"{field_name}-value-type",
                                                                                     value_type, is_optional,
-                                                                                    processed_models, created_rules)
-        gbnf_type = fr'{gbnf_type} ::= "{{" ws ( {additional_key_type} ":" ws {additional_value_type} ("," ws {additional_key_type} ":" ws {additional_value_type})*  )? "}}" ws'
-
-        rules.extend(additional_key_rules)
+                                                                                    processed_models, created_rules,
+                                                                                    depth=depth, max_depth=max_depth)
         rules.extend(additional_value_rules)
+        gbnf_type = f"{model_name}-{field_name}"
+        rules.append(format_dict_rule(gbnf_type, additional_value_type))
     elif gbnf_type.startswith("union-"):
         union_types = get_args(field_type)
         union_rules = []
 
         for union_type in union_types:
-            if not issubclass(union_type, NoneType):
+            if union_type is not NoneType:
                 union_gbnf_type, union_rules_list = generate_gbnf_rule_for_type(model_name, field_name, union_type,
                                                                                 False,
-                                                                                processed_models, created_rules)
-                union_rules.append(union_gbnf_type)
+                                                                                processed_models, created_rules,
+                                                                                depth=depth, max_depth=max_depth)
+                if union_gbnf_type is not None:
+                    union_rules.append(union_gbnf_type)
                 rules.extend(union_rules_list)
 
+        if not union_rules:
+            # Every member was cut off by the depth bound, e.g. `Optional[Node]`.
+            return '"null"', rules
         # Defining the union grammar rule separately
-        if len(union_rules) == 1:
-            union_grammar_rule = f"{model_name}-{field_name}-optional ::= ({' | '.join(union_rules)})?"
-        else:
-            union_grammar_rule = f"{model_name}-{field_name}-union ::= {' | '.join(union_rules)}"
+        gbnf_type, union_grammar_rule = format_union_rule(f"{model_name}-{field_name}", union_rules,
+                                                          nullable=NoneType in union_types)
         rules.append(union_grammar_rule)
-        if len(union_rules) == 1:
-            gbnf_type = f"{model_name}-{field_name}-optional"
-        else:
-            gbnf_type = f"{model_name}-{field_name}-union"
     elif isclass(field_type) and issubclass(field_type, str):
         if field_info and hasattr(field_info, 'pattern'):
             # Convert regex pattern to grammar rule
@@ -332,33 +561,11 @@ def generate_gbnf_rule_for_type(model_name, field_name, field_type, is_optional,
         else:
             gbnf_type = PydanticDataType.STRING.value
 
-    elif isclass(field_type) and issubclass(field_type, float) and field_info and hasattr(field_info,
-                                                                                          'json_schema_extra') and field_info.json_schema_extra is not None:
-        # Retrieve precision attributes for floats
-        max_precision = field_info.json_schema_extra.get('max_precision') if field_info and hasattr(field_info,
-                                                                                                    'json_schema_extra') else None
-        min_precision = field_info.json_schema_extra.get('min_precision') if field_info and hasattr(field_info,
-                                                                                                    'json_schema_extra') else None
-        max_digits = field_info.json_schema_extra.get('max_digit') if field_info and hasattr(field_info,
-                                                                                             'json_schema_extra') else None
-        min_digits = field_info.json_schema_extra.get('min_digit') if field_info and hasattr(field_info,
-                                                                                             'json_schema_extra') else None
-
-        # Generate GBNF rule for float with given attributes
-        gbnf_type, rules = generate_gbnf_float_rules(max_digit=max_digits, min_digit=min_digits,
-                                                     max_precision=max_precision,
-                                                     min_precision=min_precision)
-
-    elif isclass(field_type) and issubclass(field_type, int) and field_info and hasattr(field_info,
-                                                                                        'json_schema_extra') and field_info.json_schema_extra is not None:
-        # Retrieve digit attributes for integers
-        max_digits = field_info.json_schema_extra.get('max_digit') if field_info and hasattr(field_info,
-                                                                                             'json_schema_extra') else None
-        min_digits = field_info.json_schema_extra.get('min_digit') if field_info and hasattr(field_info,
-                                                                                             'json_schema_extra') else None
-
-        # Generate GBNF rule for integer with given attributes
-        gbnf_type, rules = generate_gbnf_integer_rules(max_digit=max_digits, min_digit=min_digits)
+    elif isclass(field_type) and issubclass(field_type, (int, float)) and not issubclass(field_type, bool) \
+            and get_number_constraints(field_info) is not None:
+        # Generate GBNF rule for numbers with digit / precision constraints
+        gbnf_type, rules = generate_gbnf_number_rules(issubclass(field_type, float), get_number_constraints(field_info))
+        rules = pool_rules(rules, created_rules)
 
     else:
         gbnf_type, rules = gbnf_type, []
@@ -374,7 +581,8 @@ def generate_gbnf_rule_for_type(model_name, field_name, field_type, is_optional,
             return gbnf_type, rules
 
 
-def generate_gbnf_grammar(model: Type[BaseModel], processed_models: set, created_rules: dict) -> list:
+def generate_gbnf_grammar(model: Type[BaseModel], processed_models: set, created_rules: dict, depth: int = 0,
+                          max_depth: Optional[int] = None) -> list:
     """
 
     Generate GBnF Grammar
@@ -382,8 +590,12 @@ def generate_gbnf_grammar(model: Type[BaseModel], processed_models: set, created
     Generates a GBnF grammar for a given model.
 
     :param model: A Pydantic model class to generate the grammar for. Must be a subclass of BaseModel.
-    :param processed_models: A set of already processed models to prevent infinite recursion.
+    :param processed_models: A set of the rule names of already processed models. A recursive model refers to its
+        own rule instead of being expanded again.
     :param created_rules: A dict containing already created rules to prevent duplicates.
+    :param depth: Nesting depth of the model, 0 for the models offered at the root.
+    :param max_depth: Maximum nesting depth of recursive models. By default recursion is unbounded, with a bound the
+        recursive models are unrolled into one rule per depth and the deepest ones end in empty lists or null.
     :return: A list of GBnF grammar rules in string format.
 
     Example Usage:
@@ -395,11 +607,12 @@ def generate_gbnf_grammar(model: Type[BaseModel], processed_models: set, created
     gbnf_grammar = generate_gbnf_grammar(model, processed_models, created_rules)
     ```
     """
-    if model in processed_models:
+    model_name = get_model_rule_name(model, depth, max_depth) if issubclass(model, BaseModel) \
+        else format_model_and_field_name(model.__name__)
+    claim_model_rule(model_name, model, model.__name__, created_rules)
+    if model_name in processed_models:
         return []
-
-    processed_models.add(model)
-    model_name = format_model_and_field_name(model.__name__)
+    processed_models.add(model_name)
 
     model_fields = {}
 
@@ -413,38 +626,45 @@ def generate_gbnf_grammar(model: Type[BaseModel], processed_models: set, created
             model_fields = {name: (param.annotation, param.default) for name, param in parameters.items()
                             if name != 'self'}
     else:
-        # For Pydantic models, use model_fields and check for ellipsis (required fields)
-        model_fields = model.__annotations__
+        # For Pydantic models, use the resolved annotations of model_fields and check for ellipsis (required fields)
+        model_fields = {name: (annotation, field_info) for name, annotation, field_info in get_model_fields(model)}
 
     model_rule_parts = []
     nested_rules = []
+    omittable_fields = set()
 
     for field_name, field_info in model_fields.items():
         if not issubclass(model, BaseModel):
             field_type, default_value = field_info
             # Check if the field is optional (not required)
             is_optional = (default_value is not inspect.Parameter.empty) and (default_value is not Ellipsis)
+            if is_optional:
+                omittable_fields.add(field_name)
         else:
-            field_type = field_info
-            field_info = model.model_fields[field_name]
+            field_type, field_info = field_info
             is_optional = field_info.is_required is False and get_origin(field_type) is Optional
+            if not field_info.is_required():
+                omittable_fields.add(field_name)
         rule_name, additional_rules = generate_gbnf_rule_for_type(model_name, format_model_and_field_name(field_name),
                                                                   field_type, is_optional,
-                                                                  processed_models, created_rules, field_info)
+                                                                  processed_models, created_rules, field_info,
+                                                                  depth, max_depth)
+        if rule_name is None:
+            raise ValueError(f"{model.__name__}.{field_name} nests {field_type} deeper than max_depth={max_depth}, "
+                             f"only optional, list and dict fields can end a bounded recursion")
         if rule_name not in created_rules:
             created_rules[rule_name] = additional_rules
-        model_rule_parts.append(f'\"\\\"{field_name}\\\"\" ":" ws {rule_name}')  # Adding escaped quotes
+        model_rule_parts.append((field_name, rule_name))
         nested_rules.extend(additional_rules)
 
-    fields_joined = ' ws ", " ws '.join(model_rule_parts)
-    model_rule = f'{model_name} ::= "{{" ws {fields_joined} ws "}}"'
+    model_rule = format_object_rule(model_name, model_rule_parts, omittable_fields)
     all_rules = [model_rule] + nested_rules
 
     return all_rules
 
 
 def generate_gbnf_grammar_from_pydantic(models: List[Type[BaseModel]], root_rule_class: str = None,
-                                        root_rule_content: str = None) -> str:
+                                        root_rule_content: str = None, max_depth: Optional[int] = None) -> str:
     """
     Generate GBNF Grammar from Pydantic Models.
 
@@ -455,6 +675,7 @@ def generate_gbnf_grammar_from_pydantic(models: List[Type[BaseModel]], root_rule
     - models (List[Type[BaseModel]]): A list of Pydantic models to generate the grammar from.
     - root_rule_class (str, optional): The name of the root model class. If provided, the generated grammar will have a root rule that matches the specified class. Default is None.
     - root_rule_content (str, optional): The content of the root model rule. This can be used to specify additional constraints or transformations for the root model. Default is None.
+    - max_depth (int, optional): Maximum nesting depth of recursive (self-referential) models. Default is None, which allows unbounded recursion.
 
     Returns:
     - str: The generated GBNF grammar string.
@@ -470,34 +691,12 @@ def generate_gbnf_grammar_from_pydantic(models: List[Type[BaseModel]], root_rule
     processed_models = set()
     all_rules = []
     created_rules = {}
-    if root_rule_class is None:
-
-        for model in models:
-            model_rules = generate_gbnf_grammar(model, processed_models, created_rules)
-            all_rules.extend(model_rules)
-
-        root_rule = "root ::= " + " | ".join([format_model_and_field_name(model.__name__) for model in models])
-        all_rules.insert(0, root_rule)
-        return "\n".join(all_rules)
-    elif root_rule_class is not None:
-        root_rule = f"root ::= {format_model_and_field_name(root_rule_class)}\n"
-
-        model_rule = fr'{format_model_and_field_name(root_rule_class)} ::= "{{" ws "\"{root_rule_class}\"" ":" ws grammar-models ws "}}"'
-        fields_joined = " | ".join(
-            [fr'{format_model_and_field_name(model.__name__)}-grammar-model' for model in models])
-
-        grammar_model_rules = f'\ngrammar-models ::= {fields_joined}'
-        mod_rules = []
-        for model in models:
-            mod_rule = fr'{format_model_and_field_name(model.__name__)}-grammar-model ::= '
-            mod_rule += fr'"\"{format_model_and_field_name(model.__name__)}\"" "," "\"{root_rule_content}\"" ":"  {format_model_and_field_name(model.__name__)}' + '\n'
-            mod_rules.append(mod_rule)
-        grammar_model_rules += "\n" + "\n".join(mod_rules)
-        for model in models:
-            model_rules = generate_gbnf_grammar(model, processed_models, created_rules)
-            all_rules.extend(model_rules)
-        all_rules.insert(0, root_rule + model_rule + grammar_model_rules)
-        return "\n".join(all_rules)
+    for model in models:
+        model_rules = generate_gbnf_grammar(model, processed_models, created_rules, max_depth=max_depth)
+        all_rules.extend(model_rules)
+    model_rule_names = [format_model_and_field_name(model.__name__) for model in models]
+    all_rules.insert(0, format_root_rules(model_rule_names, root_rule_class, root_rule_content))
+    return "\n".join(all_rules)
 
 
 def get_primitive_grammar(grammar):
@@ -519,48 +718,15 @@ unicode-escape ::= "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F]
 ws ::= " " | "\t" | "\n" | " " ws | "\t" ws | "\n" ws
 fractional-part ::= [0-9]+
 integer-part ::= [0-9]+
-integer ::= [0-9]+"""
+integer ::= [0-9]+
+float ::= integer-part "." fractional-part"""
     return "\n" + '\n'.join(additional_grammar) + primitive_grammar
 
 
-def generate_field_markdown(field_name: str, field_type: Type[Any], model: Type[BaseModel], depth=1) -> str:
-    indent = '  ' * depth
-    field_markdown = f"{indent}- **{field_name}** (`{field_type.__name__}`): "
-
-    # Extracting field description from Pydantic Field using __model_fields__
-    field_info = model.model_fields.get(field_name)
-    field_description = field_info.description if field_info and field_info.description else "No description available."
-
-    field_markdown += field_description + '\n'
-
-    # Handling nested BaseModel fields
-    if isclass(field_type) and issubclass(field_type, BaseModel):
-        field_markdown += f"{indent}  - Details:\n"
-        for name, type_ in field_type.__annotations__.items():
-            field_markdown += generate_field_markdown(name, type_, field_type, depth + 2)
-
-    return field_markdown
-
-
 def generate_markdown_report(pydantic_models: List[Type[BaseModel]]) -> str:
-    markdown = ""
-    for model in pydantic_models:
-        markdown += f"### {format_model_and_field_name(model.__name__)}\n"
-
-        # Check if the model's docstring is different from BaseModel's docstring
-        class_doc = getdoc(model)
-        base_class_doc = getdoc(BaseModel)
-        class_description = class_doc if class_doc and class_doc != base_class_doc else "No specific description available."
-
-        markdown += f"{class_description}\n\n"
-        markdown += "#### Fields\n"
-
-        if isclass(model) and issubclass(model, BaseModel):
-            for name, field_type in model.__annotations__.items():
-                markdown += generate_field_markdown(format_model_and_field_name(name), field_type, model)
-        markdown += "\n"
-
-    return markdown
+    """Markdown documentation of the models, rendered from cached fragments, see `documentation.DocumentationRenderer`."""
+    from .documentation import get_renderer
+    return get_renderer("markdown").render(pydantic_models)
 
 
 def format_json_example(example: dict, depth: int) -> str:
@@ -575,62 +741,9 @@ def format_json_example(example: dict, depth: int) -> str:
 
 def generate_text_documentation(pydantic_models: List[Type[BaseModel]], model_prefix="Model",
                                 fields_prefix="Fields") -> str:
-    documentation = ""
-    for model in pydantic_models:
-        documentation += f"{model_prefix}: {format_model_and_field_name(model.__name__)}\n"
-
-        # Handling multi-line model description with proper indentation
-        documentation += "  Description: "
-        class_doc = getdoc(model)
-        base_class_doc = getdoc(BaseModel)
-        class_description = class_doc if class_doc and class_doc != base_class_doc else "No specific description available."
-        documentation += "\n" + format_multiline_description(class_description, 2) + "\n\n"
-
-        # Indenting the fields section
-        documentation += f"  {fields_prefix}:\n"
-        if isclass(model) and issubclass(model, BaseModel):
-            for name, field_type in model.__annotations__.items():
-                documentation += generate_field_text(name, field_type, model)
-            documentation += "\n"
-
-        if hasattr(model, 'Config') and hasattr(model.Config,
-                                                'json_schema_extra') and 'example' in model.Config.json_schema_extra:
-            documentation += f"  Expected Example Output for {format_model_and_field_name(model.__name__)}:\n"
-            json_example = json.dumps(model.Config.json_schema_extra['example'])
-            documentation += format_multiline_description(json_example, 2) + "\n"
-
-    return documentation
-
-
-def generate_field_text(field_name: str, field_type: Type[Any], model: Type[BaseModel], depth=1) -> str:
-    indent = '    ' * depth
-    field_text = f"{indent}{field_name} ({field_type.__name__}): \n"
-
-    field_info = model.model_fields.get(field_name)
-    field_description = field_info.description if field_info else "No description available."
-
-    # Handling multi-line field description with proper indentation
-    field_text += f"{indent}  Description: " + field_description + "\n"
-
-    # Check for and include field-specific examples if available
-    if hasattr(model, 'Config') and hasattr(model.Config,
-                                            'json_schema_extra') and 'example' in model.Config.json_schema_extra:
-        field_example = model.Config.json_schema_extra['example'].get(field_name)
-        if field_example is not None:
-            example_text = f"'{field_example}'" if isinstance(field_example, str) else field_example
-            field_text += f"{indent}  Example: {example_text}\n"
-
-    if isclass(field_type) and issubclass(field_type, BaseModel):
-        field_text += f"{indent}  Details:\n"
-        for name, type_ in field_type.__annotations__.items():
-            field_text += generate_field_text(name, type_, field_type, depth + 2)
-
-    return field_text
-
-
-def format_multiline_description(description: str, indent_level: int) -> str:
-    indent = '    ' * indent_level
-    return indent + description.replace('\n', '\n' + indent)
+    """Text documentation of the models, rendered from cached fragments, see `documentation.DocumentationRenderer`."""
+    from .documentation import get_renderer
+    return get_renderer("text", model_prefix, fields_prefix).render(pydantic_models)
 
 
 def save_gbnf_grammar_and_documentation(grammar, documentation, grammar_file_path="./grammar.gbnf",
@@ -660,21 +773,8 @@ def remove_empty_lines(string):
 def generate_and_save_gbnf_grammar_and_documentation(pydantic_model_list, grammar_file_path="./generated_grammar.gbnf",
                                                      documentation_file_path="./generated_grammar_documentation.md",
                                                      root_rule_class: str = None, root_rule_content: str = None):
-    documentation = generate_text_documentation(pydantic_model_list, "Output Model", "Output Fields")
-    grammar = generate_gbnf_grammar_from_pydantic(pydantic_model_list, root_rule_class, root_rule_content)
-    grammar = remove_empty_lines(grammar)
+    from .documentation import generate_grammar_and_documentation
+    grammar, documentation = generate_grammar_and_documentation(pydantic_model_list, root_rule_class,
+                                                                root_rule_content)
     print(grammar)
     save_gbnf_grammar_and_documentation(grammar, documentation, grammar_file_path, documentation_file_path)
-
-
-class YourModel(BaseModel):
-    float_field: float = Field(default=..., description="TEST", max_precision=2, min_precision=1)
-    integer_field: int = Field(default=..., description="TEST", max_digit=5, min_digit=3)
-    float_field2: float = Field(default=..., description="TEST", max_digit=5, min_digit=3, max_precision=2,
-                                min_precision=1)
-    integer_field2: int = Field(default=..., description="TEST", max_digit=5, min_digit=3)
-
-
-
-
-
@@ -0,0 +1,386 @@
+"""
+Pure-Python GBNF parser and incremental recognizer.
+
+The recognizer mirrors the stack-based approach llama.cpp uses for grammar-constrained sampling: every parse
+position is a stack of (rule, alternative, position) frames, and feeding a character advances all stacks that
+accept it. This makes it possible to check which characters a grammar allows next without loading a model.
+"""
+import random
+from typing import Dict, List, Optional, Tuple
+
+# An element is either ("ref", rule_name) or ("char", negated, ((lo, hi), ...)) matching a single character.
+Element = tuple
+Frame = Tuple[str, int, int]
+Stack = Tuple[Frame, ...]
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", '"': '"', "[": "[", "]": "]", "/": "/", "-": "-",
+            "b": "\b", "f": "\f"}
+
+
+class GrammarParseError(ValueError):
+    pass
+
+
+class ParsedGrammar:
+    """
+    A GBNF grammar compiled into plain alternatives of single-character matchers and rule references.
+
+    Groups and repetition operators are desugared into generated helper rules, the same way llama.cpp does it.
+    Generated rules for `*`, `+`, `?` and `{m,n}` are recorded in `repeat_rules`, their first alternative
+    continues the repetition and the last alternative ends it.
+    """
+
+    def __init__(self, rules: Dict[str, List[Tuple[Element, ...]]], repeat_rules: set, root: str = "root"):
+        self.rules = rules
+        self.repeat_rules = repeat_rules
+        self.root = root
+        missing = {e[1] for alts in rules.values() for alt in alts for e in alt if e[0] == "ref"} - set(rules)
+        if missing:
+            raise GrammarParseError(f"Undefined rules: {', '.join(sorted(missing))}")
+        if root not in rules:
+            raise GrammarParseError(f"Grammar has no '{root}' rule")
+        self._min_lengths = self._compute_min_lengths()
+
+    @classmethod
+    def from_string(cls, grammar_text: str, root: str = "root") -> "ParsedGrammar":
+        return _GrammarParser(grammar_text).parse(root)
+
+    def _compute_min_lengths(self) -> Dict[str, int]:
+        inf = float("inf")
+        lengths = {name: inf for name in self.rules}
+        changed = True
+        while changed:
+            changed = False
+            for name, alts in self.rules.items():
+                for alt in alts:
+                    total = sum(1 if e[0] == "char" else lengths[e[1]] for e in alt)
+                    if total < lengths[name]:
+                        lengths[name] = total
+                        changed = True
+        return lengths
+
+    def alternative_min_length(self, rule: str, alt_index: int) -> float:
+        return sum(1 if e[0] == "char" else self._min_lengths[e[1]] for e in self.rules[rule][alt_index])
+
+
+class _GrammarParser:
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.rules: Dict[str, List[Tuple[Element, ...]]] = {}
+        self.repeat_rules = set()
+        self._generated = 0
+
+    def parse(self, root: str) -> ParsedGrammar:
+        while True:
+            self._skip_space(newlines=True)
+            if self.pos >= len(self.text):
+                break
+            name = self._parse_name()
+            self._skip_space()
+            if not self.text.startswith("::=", self.pos):
+                raise GrammarParseError(f"Expected '::=' after rule '{name}' at offset {self.pos}")
+            self.pos += 3
+            alts = self._parse_alternatives(name, nested=False)
+            self.rules.setdefault(name, []).extend(alts)
+        return ParsedGrammar(self.rules, self.repeat_rules, root)
+
+    def _skip_space(self, newlines=False):
+        while self.pos < len(self.text):
+            c = self.text[self.pos]
+            if c == "#":
+                while self.pos < len(self.text) and self.text[self.pos] != "\n":
+                    self.pos += 1
+            elif c in " \t\r" or (newlines and c == "\n"):
+                self.pos += 1
+            else:
+                break
+
+    def _parse_name(self) -> str:
+        start = self.pos
+        while self.pos < len(self.text) and (self.text[self.pos].isalnum() or self.text[self.pos] in "-_"):
+            self.pos += 1
+        if start == self.pos:
+            raise GrammarParseError(f"Expected rule name at offset {self.pos}")
+        return self.text[start:self.pos]
+
+    def _new_rule_name(self, base: str) -> str:
+        self._generated += 1
+        return f"{base}-{self._generated}"
+
+    def _parse_alternatives(self, rule_name: str, nested: bool) -> List[Tuple[Element, ...]]:
+        alts = [self._parse_sequence(rule_name, nested)]
+        while self.pos < len(self.text) and self.text[self.pos] == "|":
+            self.pos += 1
+            alts.append(self._parse_sequence(rule_name, nested))
+        return alts
+
+    def _parse_sequence(self, rule_name: str, nested: bool) -> Tuple[Element, ...]:
+        sequence: List[Element] = []
+        last_start = 0
+        while True:
+            self._skip_space(newlines=nested)
+            if self.pos >= len(self.text):
+                break
+            c = self.text[self.pos]
+            if c == "\n" or c == "|" or c == ")":
+                break
+            if c == '"':
+                self.pos += 1
+                last_start = len(sequence)
+                while self.pos < len(self.text) and self.text[self.pos] != '"':
+                    ch = self._parse_char()
+                    sequence.append(("char", False, ((ord(ch), ord(ch)),)))
+                self.pos += 1
+            elif c == "[":
+                self.pos += 1
+                last_start = len(sequence)
+                sequence.append(self._parse_char_class())
+            elif c == ".":
+                self.pos += 1
+                last_start = len(sequence)
+                sequence.append(("char", True, ()))
+            elif c == "(":
+                self.pos += 1
+                group = self._new_rule_name(rule_name)
+                self.rules[group] = self._parse_alternatives(rule_name, nested=True)
+                if self.pos >= len(self.text) or self.text[self.pos] != ")":
+                    raise GrammarParseError(f"Expected ')' at offset {self.pos}")
+                self.pos += 1
+                last_start = len(sequence)
+                sequence.append(("ref", group))
+            elif c in "*+?{":
+                if not sequence:
+                    raise GrammarParseError(f"Repetition without element at offset {self.pos}")
+                sequence[last_start:] = [self._parse_repetition(rule_name, tuple(sequence[last_start:]))]
+            elif c.isalnum() or c in "-_":
+                last_start = len(sequence)
+                sequence.append(("ref", self._parse_name()))
+            else:
+                raise GrammarParseError(f"Unexpected character {c!r} at offset {self.pos}")
+        return tuple(sequence)
+
+    def _parse_repetition(self, rule_name: str, item: Tuple[Element, ...]) -> Element:
+        c = self.text[self.pos]
+        self.pos += 1
+        if c == "*":
+            min_times, max_times = 0, None
+        elif c == "+":
+            min_times, max_times = 1, None
+        elif c == "?":
+            min_times, max_times = 0, 1
+        else:
+            end = self.text.index("}", self.pos)
+            bounds = self.text[self.pos:end].split(",")
+            self.pos = end + 1
+            min_times = int(bounds[0].strip() or 0)
+            if len(bounds) == 1:
+                max_times = min_times
+            else:
+                max_times = int(bounds[1]) if bounds[1].strip() else None
+        # Desugar into right-recursive helper rules: `x{2,}` becomes `x x x*`, `x{0,2}` becomes `(x (x)?)?`.
+        tail: Optional[str] = None
+        if max_times is None:
+            tail = self._new_rule_name(rule_name)
+            self.rules[tail] = [item + (("ref", tail),), ()]
+            self.repeat_rules.add(tail)
+        else:
+            for _ in range(max_times - min_times):
+                optional = self._new_rule_name(rule_name)
+                self.rules[optional] = [item + ((("ref", tail),) if tail else ()), ()]
+                self.repeat_rules.add(optional)
+                tail = optional
+        name = self._new_rule_name(rule_name)
+        self.rules[name] = [item * min_times + ((("ref", tail),) if tail else ())]
+        return ("ref", name)
+
+    def _parse_char(self) -> str:
+        c = self.text[self.pos]
+        if c != "\\":
+            self.pos += 1
+            return c
+        esc = self.text[self.pos + 1]
+        if esc in "xuU":
+            width = {"x": 2, "u": 4, "U": 8}[esc]
+            value = self.text[self.pos + 2:self.pos + 2 + width]
+            self.pos += 2 + width
+            return chr(int(value, 16))
+        self.pos += 2
+        return _ESCAPES.get(esc, esc)
+
+    def _parse_char_class(self) -> Element:
+        negated = False
+        if self.text[self.pos] == "^":
+            negated = True
+            self.pos += 1
+        ranges = []
+        while self.text[self.pos] != "]":
+            lo = self._parse_char()
+            hi = lo
+            if self.text[self.pos] == "-" and self.text[self.pos + 1] != "]":
+                self.pos += 1
+                hi = self._parse_char()
+            ranges.append((ord(lo), ord(hi)))
+        self.pos += 1
+        return ("char", negated, tuple(ranges))
+
+
+def char_matches(element: Element, ch: str) -> bool:
+    _, negated, ranges = element
+    code = ord(ch)
+    return any(lo <= code <= hi for lo, hi in ranges) != negated
+
+
+def is_literal(element: Element) -> bool:
+    """Whether a char element admits exactly one character."""
+    _, negated, ranges = element
+    return not negated and len(ranges) == 1 and ranges[0][0] == ranges[0][1]
+
+
+class GrammarRecognizer:
+    """
+    Incremental recognizer over a `ParsedGrammar`.
+
+    Example Usage:
+    ```
+    recognizer = GrammarRecognizer(ParsedGrammar.from_string('root ::= "yes" | "no"'))
+    recognizer.feed("y")
+    recognizer.allowed_chars()  # {"e"}
+    ```
+    """
+
+    def __init__(self, grammar: ParsedGrammar):
+        self.grammar = grammar
+        self.stacks = self._advance_all([((grammar.root, i, 0),) for i in range(len(grammar.rules[grammar.root]))])
+
+    def copy(self) -> "GrammarRecognizer":
+        clone = GrammarRecognizer.__new__(GrammarRecognizer)
+        clone.grammar = self.grammar
+        clone.stacks = self.stacks
+        return clone
+
+    def _advance_all(self, stacks) -> set:
+        ready = set()
+        for stack in stacks:
+            self._advance(stack, ready, set())
+        return ready
+
+    def _advance(self, stack: Stack, ready: set, seen: set):
+        """Expand rule references until every stack has a character matcher (or nothing) on top."""
+        if stack in seen:
+            return
+        seen.add(stack)
+        if not stack:
+            ready.add(stack)
+            return
+        rule, alt, pos = stack[-1]
+        elements = self.grammar.rules[rule][alt]
+        if pos == len(elements):
+            self._advance(self._pop(stack), ready, seen)
+            return
+        element = elements[pos]
+        if element[0] == "char":
+            ready.add(stack)
+            return
+        # A reference in tail position replaces its frame instead of growing the stack, so right-recursive
+        # repetition rules keep constant stack depth.
+        base = stack[:-1] if pos == len(elements) - 1 else stack
+        for i in range(len(self.grammar.rules[element[1]])):
+            self._advance(base + ((element[1], i, 0),), ready, seen)
+
+    @staticmethod
+    def _pop(stack: Stack) -> Stack:
+        stack = stack[:-1]
+        if not stack:
+            return stack
+        rule, alt, pos = stack[-1]
+        return stack[:-1] + ((rule, alt, pos + 1),)
+
+    def _top_element(self, stack: Stack) -> Element:
+        rule, alt, pos = stack[-1]
+        return self.grammar.rules[rule][alt][pos]
+
+    def candidates(self) -> List[Element]:
+        """Distinct character matchers that can come next."""
+        return list({self._top_element(stack) for stack in self.stacks if stack})
+
+    def can_stop(self) -> bool:
+        return () in self.stacks
+
+    def accepts(self, ch: str) -> bool:
+        return any(stack and char_matches(self._top_element(stack), ch) for stack in self.stacks)
+
+    def is_forced(self) -> bool:
+        """True if exactly one character is allowed next and the grammar can not end here."""
+        candidates = self.candidates()
+        if self.can_stop() or not candidates:
+            return False
+        first = candidates[0]
+        return is_literal(first) and all(is_literal(c) and c[2] == first[2] for c in candidates)
+
+    def feed(self, text: str):
+        for ch in text:
+            advanced = []
+            for stack in self.stacks:
+                if stack and char_matches(self._top_element(stack), ch):
+                    rule, alt, pos = stack[-1]
+                    advanced.append(stack[:-1] + ((rule, alt, pos + 1),))
+            if not advanced:
+                raise ValueError(f"Grammar does not accept {ch!r} here")
+            self.stacks = self._advance_all(advanced)
+
+
+def forced_mask(grammar: ParsedGrammar, text: str) -> List[bool]:
+    """
+    For every character of `text`, whether the grammar left no choice at that position.
+    Raises ValueError if the grammar rejects the text or the text is incomplete.
+    """
+    recognizer = GrammarRecognizer(grammar)
+    mask = []
+    for ch in text:
+        mask.append(recognizer.is_forced())
+        recognizer.feed(ch)
+    if not recognizer.can_stop():
+        raise ValueError("Text is an incomplete sentence of the grammar")
+    return mask
+
+
+_PRINTABLE = [chr(c) for c in range(ord("a"), ord("z") + 1)] + [" "] * 4 + [chr(c) for c in range(ord("0"), ord("9") + 1)]
+
+
+def _random_char(element: Element, rng: random.Random) -> str:
+    _, negated, ranges = element
+    if negated:
+        choices = [c for c in _PRINTABLE if char_matches(element, c)]
+        return rng.choice(choices)
+    lo, hi = rng.choice(ranges)
+    return chr(rng.randint(lo, hi))
+
+
+def random_sentence(grammar: ParsedGrammar, rng: random.Random, mean_repeat: float = 6.0,
+                    max_depth: int = 24) -> str:
+    """
+    Sample a random sentence from the grammar by top-down derivation.
+
+    Repetitions continue with probability `1 - 1 / mean_repeat`, other alternatives are picked uniformly.
+    Beyond `max_depth` the shortest alternative is taken so that recursive grammars terminate.
+    """
+    out = []
+    continue_probability = 1.0 - 1.0 / mean_repeat
+
+    def expand(rule: str, depth: int):
+        alts = grammar.rules[rule]
+        if depth > max_depth:
+            index = min(range(len(alts)), key=lambda i: grammar.alternative_min_length(rule, i))
+        elif rule in grammar.repeat_rules:
+            index = 0 if rng.random() < continue_probability else len(alts) - 1
+        else:
+            index = rng.randrange(len(alts))
+        for element in alts[index]:
+            if element[0] == "char":
+                out.append(_random_char(element, rng))
+            else:
+                expand(element[1], depth + 1)
+
+    expand(grammar.root, 0)
+    return "".join(out)
@@ -0,0 +1,117 @@
+"""
+Keep the prompt of a long agent conversation within a token budget.
+
+The system prompt (with the tool descriptions that `chat_template_format` appends to it) stays pinned and the most
+recent turns stay verbatim. Older turns are folded into short stubs, tool outputs truncated or summarized, oldest
+first. Folding is incremental: a stub never changes once created and the history is folded down to a low-water
+mark, so the rendered prefix stays identical over many turns and its KV cache can be reused.
+"""
+import json
+from typing import Callable, List, Optional
+
+from .completion import format_chat_message
+from .tool_prompt import count_tokens
+
+
+def truncate(text: str, tokens: int, max_tokens: int) -> str:
+    """Cut `text` of `tokens` tokens down to roughly `max_tokens` tokens."""
+    if tokens <= max_tokens:
+        return text
+    keep = max(len(text) * max_tokens // tokens, 1)
+    return f"{text[:keep]}... [truncated {tokens - max_tokens} tokens]"
+
+
+class HistoryManager:
+    """
+    Folds one conversation into at most `token_budget` tokens, counted with the tokenizer of `llm`.
+
+    :param keep_recent: Number of most recent messages that are never folded.
+    :param stub_tokens: Size of the stub an old message is truncated to.
+    :param summarize: Optional `summarize(message) -> str` that replaces truncation, e.g. a call to a small model.
+    :param low_water: When the budget is exceeded, fold until the history uses at most this share of it, so the
+        next turns can be appended without folding again.
+
+    Example Usage:
+    ```
+    history = HistoryManager(llm, token_budget=6000)
+    response = function_call_completion(llm, messages, functions, history=history)
+    ```
+    """
+
+    def __init__(self, llm, token_budget: int, keep_recent: int = 6, stub_tokens: int = 48,
+                 summarize: Optional[Callable[[dict], str]] = None, low_water: float = 0.75):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.stub_tokens = stub_tokens
+        self.summarize = summarize
+        self.low_water = low_water
+        self.reset()
+
+    def reset(self):
+        self._history: List[dict] = []
+        self._stubs: List[Optional[dict]] = []  # None for messages dropped entirely
+        self.last_tokens = 0
+
+    def tokens(self, message: dict) -> int:
+        return count_tokens(self.llm, format_chat_message(message))
+
+    def fold(self, message: dict) -> dict:
+        """The stub of an old message."""
+        if self.summarize is not None:
+            return {"role": message["role"], "content": self.summarize(message)}
+        content = message.get("content") or ""
+        if message.get("function_call"):
+            content += f" <function_call> {json.dumps(message['function_call'], separators=(',', ':'))}"
+        tokens = count_tokens(self.llm, content)
+        return {"role": message["role"], "content": truncate(content, tokens, self.stub_tokens)}
+
+    def _is_continuation(self, turns: List[dict]) -> bool:
+        known = len(self._history)
+        return len(turns) >= known and turns[:known] == self._history
+
+    def fit(self, messages: List[dict], system_prompt_addition: str = "") -> List[dict]:
+        """
+        The messages to render for this turn.
+
+        :param system_prompt_addition: The text `chat_template_format` appends to the first system message, see
+            `completion.format_system_prompt_addition`. It is pinned as well and counts against the budget.
+        """
+        pinned = 0
+        while pinned < len(messages) and messages[pinned]["role"] == "system":
+            pinned += 1
+        system = list(messages[:pinned])
+        turns = messages[pinned:]
+        if not self._is_continuation(turns):
+            self.reset()
+        self._history = [dict(message) for message in turns]
+
+        folded = len(self._stubs)
+        foldable = max(len(turns) - self.keep_recent, 0)
+        # The system messages as rendered, the first one with the addition.
+        used = sum(count_tokens(self.llm, format_chat_message(message, system_prompt_addition if i == 0 else ""))
+                   for i, message in enumerate(system))
+        used += sum(self.tokens(stub) for stub in self._stubs if stub is not None)
+        used += sum(self.tokens(message) for message in turns[folded:])
+        if used > self.token_budget:
+            target = self.token_budget * self.low_water
+            while used > target and folded < foldable:
+                stub = self.fold(turns[folded])
+                used += self.tokens(stub) - self.tokens(turns[folded])
+                self._stubs.append(stub)
+                folded += 1
+            # Only if the stubs overflow the budget are they dropped, which invalidates the cached prefix, so drop
+            # down to the low-water mark as well.
+            if used > self.token_budget:
+                dropped = 0
+                while used > target and dropped < len(self._stubs):
+                    if self._stubs[dropped] is not None:
+                        used -= self.tokens(self._stubs[dropped])
+                        self._stubs[dropped] = None
+                    dropped += 1
+        self.last_tokens = used
+        return system + [stub for stub in self._stubs if stub is not None] + list(turns[folded:])
+
+    @property
+    def folded_messages(self) -> int:
+        return len(self._stubs)
@@ -0,0 +1,236 @@
+"""
+Generate GBNF grammars directly from JSON Schema, e.g. the `parameters` of an OpenAI style `tools` entry or a
+function's `openapi_json`, without creating Pydantic models first.
+
+The rules are emitted with the same helpers and naming as `generate_gbnf_grammar_from_pydantic`, so for a schema
+produced by `Model.model_json_schema()` both paths return the same grammar.
+"""
+from typing import List, Optional, Tuple
+
+from .grammar_generator import (PydanticDataType, claim_model_rule, enum_rule_name, format_array_rule,
+                                format_dict_rule, format_enum_rule, format_model_and_field_name, format_object_rule,
+                                format_root_rules, format_union_rule, generate_gbnf_number_rules, pool_rules)
+
+NUMBER_CONSTRAINT_KEYS = ("max_digit", "min_digit", "max_precision", "min_precision", "minimum", "maximum")
+EXCLUSIVE_BOUND_KEYS = {"exclusiveMinimum": "minimum", "exclusiveMaximum": "maximum"}
+
+
+def tool_parameters_schema(tool: dict) -> dict:
+    """
+    Return the parameters JSON Schema of a tool. Accepts OpenAI style tools (`{"type": "function", "function":
+    {...}}`), function specs (`{"name": ..., "parameters": {...}}`) and plain JSON Schema objects. The schema title
+    defaults to the function name, it is used as the name of the model rule.
+    """
+    if tool.get("type") == "function" and "function" in tool:
+        tool = tool["function"]
+    if "parameters" in tool:
+        schema = dict(tool["parameters"])
+        schema.setdefault("title", tool["name"])
+    else:
+        schema = tool
+    if "$ref" in schema and "properties" not in schema:
+        # The schema of a recursive model is a reference into its own definitions.
+        definitions = {**schema.get("definitions", {}), **schema.get("$defs", {})}
+        name, target = resolve_ref(schema["$ref"], definitions)
+        return {"title": name, **target, "$defs": definitions}
+    return schema
+
+
+def resolve_ref(ref: str, definitions: dict) -> Tuple[str, dict]:
+    """Resolve a local `#/$defs/Name` (or `#/definitions/Name`) reference to its name and schema."""
+    if not ref.startswith("#/"):
+        raise ValueError(f"Only local references are supported, got {ref}")
+    name = ref.rsplit("/", 1)[-1]
+    if name not in definitions:
+        raise ValueError(f"Unresolved reference {ref}")
+    return name, definitions[name]
+
+
+def _unwrap(schema: dict) -> dict:
+    # Pydantic wraps references with sibling keywords like `description` into a single element `allOf`.
+    if "allOf" in schema and len(schema["allOf"]) == 1:
+        merged = {key: value for key, value in schema.items() if key != "allOf"}
+        merged.update(schema["allOf"][0])
+        return merged
+    return schema
+
+
+def _is_object_model(schema: dict) -> bool:
+    return schema.get("type") == "object" and "properties" in schema
+
+
+def _referenced_names(schema) -> List[str]:
+    if isinstance(schema, dict):
+        names = [schema["$ref"].rsplit("/", 1)[-1]] if "$ref" in schema else []
+        return names + [name for value in schema.values() for name in _referenced_names(value)]
+    if isinstance(schema, list):
+        return [name for value in schema for name in _referenced_names(value)]
+    return []
+
+
+def is_recursive_definition(name: str, definitions: dict) -> bool:
+    """Whether the definition `name` refers back to itself, the counterpart of `is_recursive_model`."""
+    seen = set()
+    stack = [name]
+    while stack:
+        for referenced in _referenced_names(definitions.get(stack.pop(), {})):
+            if referenced == name:
+                return True
+            if referenced not in seen:
+                seen.add(referenced)
+                stack.append(referenced)
+    return False
+
+
+def generate_gbnf_rule_for_schema(model_name: str, field_name: str, schema: dict, definitions: dict,
+                                  processed_models: set, created_rules: dict) -> Tuple[str, list]:
+    """
+    Generate the GBNF rule for the JSON Schema of a field, mirroring `generate_gbnf_rule_for_type`.
+
+    :return: Tuple containing the GBNF type and a list of additional rules.
+    """
+    schema = _unwrap(schema)
+    rules = []
+
+    if "$ref" in schema:
+        ref_name, target = resolve_ref(schema["$ref"], definitions)
+        target = dict(target)
+        target.setdefault("title", ref_name)
+        if _is_object_model(target):
+            rules.extend(generate_gbnf_grammar_from_json_schema(target, processed_models, created_rules,
+                                                                definitions))
+            return format_model_and_field_name(target["title"]), rules
+        if "enum" in target:
+            # A named enum, e.g. a Python `Enum` class, shares one rule across all fields like on the Pydantic path.
+            enum_rule = enum_rule_name(ref_name, target["enum"])
+            return enum_rule, pool_rules([format_enum_rule(enum_rule, target["enum"])], created_rules)
+        schema = {**target, **{key: value for key, value in schema.items() if key != "$ref"}}
+
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema = {key: value for key, value in schema.items() if key != "type"}
+        schema["anyOf"] = [{"type": t} for t in schema_type]
+
+    if "enum" in schema:
+        rules.append(format_enum_rule(f"{model_name}-{field_name}", schema["enum"]))
+        return f"{model_name}-{field_name}", rules
+    if "anyOf" in schema or "oneOf" in schema:
+        union_rules = []
+        nullable = False
+        for member in schema.get("anyOf", schema.get("oneOf")):
+            if _unwrap(member).get("type") == "null":
+                nullable = True
+                continue
+            member_rule, member_rules = generate_gbnf_rule_for_schema(model_name, field_name, member, definitions,
+                                                                      processed_models, created_rules)
+            union_rules.append(member_rule)
+            rules.extend(member_rules)
+        gbnf_type, union_rule = format_union_rule(f"{model_name}-{field_name}", union_rules, nullable=nullable)
+        rules.append(union_rule)
+        return gbnf_type, rules
+    if schema_type == "array":
+        element_rule, element_rules = generate_gbnf_rule_for_schema(
+            model_name, format_model_and_field_name(f"{field_name}-element"), schema.get("items", {}), definitions,
+            processed_models, created_rules)
+        rules.extend(element_rules)
+        recursive = any(is_recursive_definition(name, definitions) for name in _referenced_names(schema.get("items")))
+        rules.append(format_array_rule(f"{model_name}-{field_name}", element_rule, allow_empty=recursive))
+        return f"{model_name}-{field_name}", rules
+    if schema_type == "object":
+        if "properties" in schema:
+            nested = dict(schema)
+            nested.setdefault("title", f"{model_name}-{field_name}")
+            rules.extend(generate_gbnf_grammar_from_json_schema(nested, processed_models, created_rules,
+                                                                definitions))
+            return format_model_and_field_name(nested["title"]), rules
+        # A mapping, e.g. `Dict[str, int]`, keys are always strings in JSON.
+        value_schema = schema.get("additionalProperties")
+        value_rule = PydanticDataType.STRING.value
+        if isinstance(value_schema, dict):
+            value_rule, value_rules = generate_gbnf_rule_for_schema(
+                model_name, f"{field_name}-value-type", value_schema, definitions, processed_models, created_rules)
+            rules.extend(value_rules)
+        dict_rule = f"{model_name}-{field_name}"
+        rules.append(format_dict_rule(dict_rule, value_rule))
+        return dict_rule, rules
+    if schema_type in ("integer", "number"):
+        constraints = {key: schema[key] for key in NUMBER_CONSTRAINT_KEYS if key in schema}
+        # Digit counts only approximate the bounds, so exclusive bounds map like inclusive ones (`gt` and `lt` on
+        # the Pydantic path, see `get_number_constraints`).
+        for exclusive_key, bound in EXCLUSIVE_BOUND_KEYS.items():
+            if exclusive_key in schema:
+                constraints.setdefault(bound, schema[exclusive_key])
+        if constraints:
+            number_rule, number_rules = generate_gbnf_number_rules(schema_type == "number", constraints)
+            return number_rule, pool_rules(number_rules, created_rules)
+        return PydanticDataType.INTEGER.value if schema_type == "integer" else PydanticDataType.FLOAT.value, rules
+    if schema_type == "boolean":
+        return PydanticDataType.BOOLEAN.value, rules
+    return PydanticDataType.STRING.value, rules
+
+
+def generate_gbnf_grammar_from_json_schema(schema: dict, processed_models: set, created_rules: dict,
+                                           definitions: Optional[dict] = None) -> list:
+    """
+    Generate the GBNF rules for an object schema, mirroring `generate_gbnf_grammar`.
+
+    The properties are emitted in order. Properties that are not `required` may be left out, as fields with a
+    default are on the Pydantic path.
+
+    :param schema: JSON Schema of an object with a `title` and `properties`.
+    :param processed_models: A set of the rule names of already processed models to prevent infinite recursion.
+    :param created_rules: A dict containing already created rules to prevent duplicates.
+    :param definitions: The `$defs` to resolve references against, defaults to the schema's own.
+    :return: A list of GBNF grammar rules in string format.
+    """
+    if definitions is None:
+        definitions = {**schema.get("definitions", {}), **schema.get("$defs", {})}
+    title = schema.get("title", "model")
+    model_name = format_model_and_field_name(title)
+    model = (title, {key: value for key, value in schema.items() if key not in ("$defs", "definitions")})
+    claim_model_rule(model_name, model, title, created_rules)
+    if model_name in processed_models:
+        return []
+    processed_models.add(model_name)
+
+    model_rule_parts = []
+    nested_rules = []
+    required = set(schema.get("required", []))
+    for field_name, field_schema in schema.get("properties", {}).items():
+        rule_name, additional_rules = generate_gbnf_rule_for_schema(model_name, format_model_and_field_name(field_name),
+                                                                    field_schema, definitions, processed_models,
+                                                                    created_rules)
+        if rule_name not in created_rules:
+            created_rules[rule_name] = additional_rules
+        model_rule_parts.append((field_name, rule_name))
+        nested_rules.extend(additional_rules)
+
+    optional_fields = {field_name for field_name, _ in model_rule_parts if field_name not in required}
+    return [format_object_rule(model_name, model_rule_parts, optional_fields)] + nested_rules
+
+
+def generate_gbnf_grammar_from_json_schemas(tools: List[dict], root_rule_class: str = None,
+                                            root_rule_content: str = None) -> str:
+    """
+    Generate a GBNF grammar from JSON Schemas, the counterpart of `generate_gbnf_grammar_from_pydantic`.
+
+    :param tools: Tool definitions or parameter schemas, see `tool_parameters_schema`.
+    :param root_rule_class: See `generate_gbnf_grammar_from_pydantic`.
+    :param root_rule_content: See `generate_gbnf_grammar_from_pydantic`.
+    :return: The generated GBNF grammar string.
+
+    Example Usage:
+    ```
+    grammar = generate_gbnf_grammar_from_json_schemas([{"type": "function", "function": {"name": "UserDetail",
+        "parameters": {"type": "object", "properties": {"name": {"type": "string"}}}}}])
+    ```
+    """
+    processed_models = set()
+    all_rules = []
+    created_rules = {}
+    schemas = [tool_parameters_schema(tool) for tool in tools]
+    for schema in schemas:
+        all_rules.extend(generate_gbnf_grammar_from_json_schema(schema, processed_models, created_rules))
+    model_rule_names = [format_model_and_field_name(schema.get("title", "model")) for schema in schemas]
+    all_rules.insert(0, format_root_rules(model_rule_names, root_rule_class, root_rule_content))
+    return "\n".join(all_rules)
@@ -0,0 +1,153 @@
+"""
+Lightweight metrics for the function calling pipeline.
+
+Stages are timed into in-memory histograms, counters track events like cache hits, and gauges hold the latest
+value of things like the grammar size. Every observation is also passed to registered callbacks, so metrics can
+be forwarded to any backend, and `to_prometheus` renders everything in the Prometheus text exposition format.
+Nothing is ever written to stdout.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class Metrics:
+    """
+    Registry of histograms, counters and gauges.
+
+    Example Usage:
+    ```
+    metrics = Metrics(callbacks=[lambda kind, name, value, labels: ...])
+    with metrics.stage("decode"):
+        ...
+    metrics.increment("cache_hits_total", labels={"cache": "grammar"})
+    print(metrics.to_prometheus())
+    ```
+    """
+
+    def __init__(self, prefix: str = "function_call", callbacks: Optional[List[Callable]] = None,
+                 buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.callbacks = list(callbacks or [])
+        self.buckets = buckets
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback: Callable):
+        """Register `callback(kind, name, value, labels)`, called for every observation."""
+        self.callbacks.append(callback)
+
+    def _notify(self, kind: str, name: str, value: float, labels: Optional[Dict[str, str]]):
+        for callback in self.callbacks:
+            callback(kind, name, value, labels or {})
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None, buckets=None):
+        """Add `value` to a histogram, `buckets` only takes effect when the histogram is created."""
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets or self.buckets)
+            histogram.observe(value)
+        self._notify("histogram", name, value, labels)
+
+    def increment(self, name: str, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self._notify("counter", name, amount, labels)
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = value
+        self._notify("gauge", name, value, labels)
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Time the enclosed block into the `stage_seconds` histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, {"stage": stage})
+
+    def record_cache(self, cache: str, hit: bool):
+        self.increment("cache_hits_total" if hit else "cache_misses_total", labels={"cache": cache})
+
+    def hit_rate(self, cache: str) -> float:
+        labels = _labels({"cache": cache})
+        hits = self.counters.get(("cache_hits_total", labels), 0)
+        misses = self.counters.get(("cache_misses_total", labels), 0)
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def stage_mean(self, stage: str) -> float:
+        histogram = self.histograms.get(("stage_seconds", _labels({"stage": stage})))
+        return histogram.mean if histogram else 0.0
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in values}):
+                    full_name = f"{self.prefix}_{name}"
+                    lines.append(f"# TYPE {full_name} {kind}")
+                    for (metric, labels), value in sorted(values.items()):
+                        if metric == name:
+                            lines.append(f"{full_name}{_format_labels(labels)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                full_name = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {full_name} histogram")
+                for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{full_name}_bucket{_format_labels(labels, (('le', str(bound)),))} {count}")
+                    lines.append(f"{full_name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+DEFAULT_METRICS = Metrics()
@@ -0,0 +1,166 @@
+"""
+Cache of completions for deterministic requests, keyed by the rendered prompt, the grammar and the sampling
+parameters. A hit skips tokenization and generation entirely.
+
+Entries live in an in-memory LRU with a TTL and optionally in a directory shared by several workers or restarts,
+which evicts the least recently used entries once it grows beyond `max_disk_bytes`.
+Only the completion dict is stored; the function call is parsed again on a hit so callers still get fresh Pydantic
+model instances.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+def grammar_fingerprint(grammar_text: str) -> str:
+    return hashlib.sha256(grammar_text.encode("utf-8")).hexdigest()
+
+
+def normalize_whitespace(prompt: str) -> str:
+    """Ignore trailing whitespace and runs of blank lines, which do not change what is asked."""
+    prompt = "\n".join(line.rstrip() for line in prompt.split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", prompt)
+
+
+def normalize_sampling(value):
+    """Hash numbers by value, so `{"temperature": 0}` and `{"temperature": 0.0}` share an entry."""
+    if isinstance(value, dict):
+        return {name: normalize_sampling(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_sampling(item) for item in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+class ResponseCache:
+    """
+    :param max_entries: Size of the in-memory LRU.
+    :param ttl_seconds: Lifetime of an entry, None for no expiry.
+    :param directory: Optional directory for the on-disk tier.
+    :param max_disk_bytes: Size of the on-disk tier, the least recently used files are deleted beyond it.
+    :param normalize: Optional function applied to the prompt before hashing, e.g. `normalize_whitespace`.
+    :param deterministic_only: Only cache requests sampled with temperature 0, other requests bypass the cache.
+
+    Example Usage:
+    ```
+    cache = ResponseCache(ttl_seconds=3600, directory="/var/cache/responses", max_disk_bytes=2**30)
+    response = function_call_completion(llm, messages, functions, sampling={"temperature": 0.0},
+                                        response_cache=cache)
+    ```
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None, directory: Optional[str] = None,
+                 max_disk_bytes: int = 256 * 2 ** 20, normalize: Optional[Callable[[str], str]] = None,
+                 deterministic_only: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.normalize = normalize
+        self.deterministic_only = deterministic_only
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def cacheable(self, sampling: Optional[dict]) -> bool:
+        if not self.deterministic_only:
+            return True
+        return sampling is not None and sampling.get("temperature") == 0
+
+    def key(self, prompt: str, grammar_text: str, sampling: Optional[dict]) -> str:
+        if self.normalize is not None:
+            prompt = self.normalize(prompt)
+        payload = json.dumps([prompt, grammar_fingerprint(grammar_text), normalize_sampling(sampling or {})], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, completion = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    return json.loads(completion)
+                del self._entries[key]
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key)) as file:
+                entry = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if self._expired(entry["stored_at"]):
+            self._remove_file(key)
+            return None
+        try:
+            os.utime(self._path(key))  # Mark as recently used for eviction.
+        except FileNotFoundError:
+            pass
+        self._remember(key, entry["stored_at"], json.dumps(entry["completion"]))
+        return entry["completion"]
+
+    def put(self, key: str, completion: dict):
+        completion = {name: value for name, value in completion.items() if name != "function_call"}
+        stored_at = time.time()
+        self._remember(key, stored_at, json.dumps(completion))
+        if self.directory is None:
+            return
+        with tempfile.NamedTemporaryFile("w", dir=self.directory, delete=False, suffix=".tmp") as file:
+            json.dump({"stored_at": stored_at, "completion": completion}, file)
+        os.replace(file.name, self._path(key))
+        self.evict()
+
+    def _remember(self, key: str, stored_at: float, completion: str):
+        # Stored serialized, so callers can not mutate cached entries.
+        with self._lock:
+            self._entries[key] = (stored_at, completion)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Delete the least recently used files until the on-disk tier fits `max_disk_bytes`."""
+        if self.directory is None:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:  # Removed by another worker.
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            self._remove_file(name[:-len(".json")])
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    self._remove_file(name[:-len(".json")])
@@ -0,0 +1,218 @@
+"""
+Persistent snapshots of agent sessions: the rendered prompt, its token ids and the model state (KV cache) after
+each turn, so that a session that moves to another worker or survives a restart only evaluates its new turn.
+
+Each snapshot is a single binary file:
+
+    b"MFCS" | header length (uint32, little endian) | JSON header | token ids (int32) | scores (float32) | llama state
+
+The sections are 64 byte aligned and read through `mmap`, so checking whether a snapshot matches the loaded
+model state does not read the KV cache, and token ids and scores are loaded without copying when numpy is
+available. The store evicts the least recently used snapshots once it grows beyond `max_bytes`.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+MAGIC = b"MFCS"
+VERSION = 1
+ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def evaluated_tokens(llm) -> List[int]:
+    """The tokens whose KV cache entries `llm` currently holds."""
+    return [int(token) for token in llm.input_ids[:llm.n_tokens]]
+
+
+def _state_class(llm):
+    state_class = getattr(llm, "state_class", None)
+    if state_class is not None:
+        return state_class
+    if hasattr(llm, "save_state") and type(llm).__module__.startswith("llama_cpp"):
+        from llama_cpp.llama import LlamaState
+        return LlamaState
+    return None
+
+
+class SessionSnapshot:
+    """A memory-mapped snapshot. Use as a context manager or call `close`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a session snapshot")
+        (header_length,) = struct.unpack_from("<I", self._mmap, 4)
+        self.header = json.loads(self._mmap[8:8 + header_length])
+
+    @property
+    def prompt(self) -> str:
+        return self.header["prompt"]
+
+    def token_ids(self) -> List[int]:
+        start, count = self.header["tokens_offset"], self.header["n_tokens"]
+        tokens = array("i")
+        tokens.frombytes(self._mmap[start:start + 4 * count])
+        return tokens.tolist()
+
+    def _numpy_tokens(self):
+        import numpy as np
+        return np.frombuffer(self._mmap, dtype=np.intc, count=self.header["n_tokens"],
+                             offset=self.header["tokens_offset"])
+
+    def _numpy_scores(self):
+        shape = self.header["scores_shape"]
+        if not shape:
+            return None
+        import numpy as np
+        count = shape[0] * shape[1]
+        return np.frombuffer(self._mmap, dtype=np.single, count=count,
+                             offset=self.header["scores_offset"]).reshape(shape)
+
+    def llama_state(self) -> bytes:
+        start = self.header["state_offset"]
+        return self._mmap[start:start + self.header["llama_state_size"]]
+
+    def to_state(self, state_class, n_ctx: Optional[int] = None):
+        """
+        The snapshot as a `state_class` (e.g. `LlamaState`). `Llama.load_state` takes `input_ids` as the model's
+        token buffer, which `eval` writes into up to the context size, so it is padded to `n_ctx` entries.
+        """
+        n_tokens = self.header["n_tokens"]
+        padding = max((n_ctx or 0) - n_tokens, 0)
+        try:
+            import numpy as np
+            input_ids = np.zeros(n_tokens + padding, dtype=np.intc)
+            input_ids[:n_tokens] = self._numpy_tokens()
+            scores = self._numpy_scores()
+        except ImportError:
+            input_ids, scores = self.token_ids() + [0] * padding, None
+        return state_class(input_ids=input_ids, scores=scores, n_tokens=self.header["n_tokens"],
+                           llama_state=self.llama_state(), llama_state_size=self.header["llama_state_size"],
+                           seed=self.header["seed"])
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SessionStore:
+    """
+    Directory of session snapshots with size-based LRU eviction.
+
+    Example Usage:
+    ```
+    store = SessionStore("/var/cache/sessions", max_bytes=20 * 2**30)
+    response = function_call_completion(llm, messages, functions, session_store=store, session_id="abc")
+    ```
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 8 * 2 ** 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, session_id: str) -> str:
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", session_id)
+        return os.path.join(self.directory, f"{safe_id}.session")
+
+    def __contains__(self, session_id: str) -> bool:
+        return os.path.exists(self.path(session_id))
+
+    def open(self, session_id: str) -> Optional[SessionSnapshot]:
+        path = self.path(session_id)
+        try:
+            snapshot = SessionSnapshot(path)
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # Mark as recently used for eviction.
+        return snapshot
+
+    def save(self, session_id: str, prompt: str, llm):
+        """Snapshot the current state of `llm` after rendering `prompt`."""
+        state = llm.save_state()
+        n_tokens = int(state.n_tokens)
+        tokens = array("i", [int(token) for token in state.input_ids[:n_tokens]]).tobytes()
+        scores = b""
+        scores_shape = []
+        if state.scores is not None and getattr(state.scores, "size", 0):
+            scores_array = state.scores[:n_tokens]
+            scores = scores_array.astype("float32").tobytes()
+            scores_shape = list(scores_array.shape)
+        llama_state = bytes(state.llama_state)[:state.llama_state_size]
+
+        header = {"version": VERSION, "session_id": session_id, "prompt": prompt, "created": time.time(),
+                  "n_tokens": n_tokens, "seed": int(state.seed), "scores_shape": scores_shape,
+                  "llama_state_size": len(llama_state)}
+        # The header holds the section offsets, which depend on the header length, so size it with placeholders.
+        header.update(tokens_offset=0, scores_offset=0, state_offset=0)
+        header_length = len(json.dumps(header).encode("utf-8")) + 64
+        header["tokens_offset"] = _align(8 + header_length)
+        header["scores_offset"] = _align(header["tokens_offset"] + len(tokens))
+        header["state_offset"] = _align(header["scores_offset"] + len(scores))
+        header_bytes = json.dumps(header).encode("utf-8").ljust(header_length)
+
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False, suffix=".tmp") as file:
+            file.write(MAGIC + struct.pack("<I", header_length) + header_bytes)
+            for offset, data in ((header["tokens_offset"], tokens), (header["scores_offset"], scores),
+                                 (header["state_offset"], llama_state)):
+                file.write(b"\0" * (offset - file.tell()))
+                file.write(data)
+        os.replace(file.name, self.path(session_id))
+        self.evict()
+
+    def restore(self, session_id: str, llm) -> Optional[str]:
+        """
+        Load the snapshot of `session_id` into `llm` unless the model already holds exactly that state.
+
+        :return: The prompt of the snapshot, or None if there is none.
+        """
+        snapshot = self.open(session_id)
+        if snapshot is None:
+            return None
+        with snapshot:
+            if evaluated_tokens(llm) != snapshot.token_ids():
+                n_ctx = llm.n_ctx() if callable(getattr(llm, "n_ctx", None)) else None
+                llm.load_state(snapshot.to_state(_state_class(llm), n_ctx))
+            return snapshot.prompt
+
+    def delete(self, session_id: str):
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Delete the least recently used snapshots until the store fits `max_bytes`."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".session"):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                os.remove(os.path.join(self.directory, name))
+                total -= size
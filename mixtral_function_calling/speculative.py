@@ -0,0 +1,165 @@
+"""
+Speculative decoding of function arguments with a small draft model.
+
+`GrammarDraftModel` follows the `LlamaDraftModel` interface of llama-cpp-python: it is called with the token ids so
+far and returns the tokens it predicts next. The target model verifies all of them in one batch. Drafts are cut
+at the first token the function call grammar rejects, so the target never wastes a batch slot on them.
+
+Example Usage:
+```
+llm = Llama(model_path="mixtral-8x7b.Q4_K_M.gguf")
+attach_draft_model(llm, Llama(model_path="mistral-7b.Q2_K.gguf"), num_pred_tokens=8)
+response = function_call_completion(llm, messages, functions)
+llm.draft_model.stats.acceptance_rate()
+```
+The draft model has to share the target's vocabulary.
+"""
+import threading
+from typing import Dict, List, Optional
+
+from .grammar_recognizer import GrammarRecognizer, ParsedGrammar
+
+
+class SpeculativeStats:
+    """Proposed and accepted draft tokens per tool."""
+
+    def __init__(self):
+        self.per_tool: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool: str, proposed: int, accepted: int):
+        with self._lock:
+            counts = self.per_tool.setdefault(tool, {"proposed": 0, "accepted": 0, "completions": 0})
+            counts["proposed"] += proposed
+            counts["accepted"] += accepted
+            counts["completions"] += 1
+
+    def acceptance_rate(self, tool: Optional[str] = None) -> float:
+        tools = [self.per_tool[tool]] if tool is not None else list(self.per_tool.values())
+        proposed = sum(counts["proposed"] for counts in tools)
+        accepted = sum(counts["accepted"] for counts in tools)
+        return accepted / proposed if proposed else 0.0
+
+    def as_dict(self) -> Dict[str, dict]:
+        return {tool: {**counts, "acceptance_rate": self.acceptance_rate(tool)}
+                for tool, counts in self.per_tool.items()}
+
+
+def _as_token_array(tokens: List[int]):
+    # llama-cpp-python expects a numpy array from draft models, numpy is a dependency of llama-cpp-python.
+    try:
+        import numpy as np
+    except ImportError:
+        return tokens
+    return np.array(tokens, dtype=np.intc)
+
+
+def _common_prefix_length(a, b) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class GrammarDraftModel:
+    """
+    Draft model that proposes `num_pred_tokens` greedy tokens from `draft_llm` and keeps only the grammar-valid
+    prefix of the proposal.
+
+    `begin` has to be called with the prompt length and grammar before every completion, `finish` afterwards with
+    the generated tokens to attribute the acceptance counts to the called tool; `function_call_completion` does both.
+    """
+
+    def __init__(self, draft_llm, num_pred_tokens: int = 8):
+        self.draft_llm = draft_llm
+        self.num_pred_tokens = num_pred_tokens
+        self.stats = SpeculativeStats()
+        self._grammars: Dict[str, ParsedGrammar] = {}
+        self._grammar: Optional[ParsedGrammar] = None
+        self._prompt_length = 0
+        self._reset_completion()
+
+    def _reset_completion(self):
+        self._recognizer: Optional[GrammarRecognizer] = None
+        self._fed_text = ""
+        self._last_input_length = 0
+        self._last_proposal: List[int] = []
+        self.proposed = 0
+        self.accepted = 0
+
+    def begin(self, prompt_length: int, grammar_text: Optional[str] = None):
+        self._prompt_length = prompt_length
+        if grammar_text is None:
+            self._grammar = None
+        else:
+            if grammar_text not in self._grammars:
+                self._grammars[grammar_text] = ParsedGrammar.from_string(grammar_text)
+            self._grammar = self._grammars[grammar_text]
+        self._reset_completion()
+        if hasattr(self.draft_llm, "begin"):
+            self.draft_llm.begin(prompt_length, grammar_text)
+
+    def finish(self, tool: Optional[str], output_tokens: Optional[List[int]] = None):
+        """
+        Record the counts of the completion for `tool`. The proposal of the last call is only verified by the
+        target after it, so it is credited against `output_tokens`, the tokens generated after the prompt.
+        """
+        if self._last_proposal and output_tokens is not None:
+            generated_before = self._last_input_length - self._prompt_length
+            self.accepted += _common_prefix_length(list(output_tokens)[generated_before:], self._last_proposal)
+            self._last_proposal = []
+        self.stats.record(tool or "unknown", self.proposed, self.accepted)
+
+    def _recognizer_at(self, output_text: str) -> Optional[GrammarRecognizer]:
+        if self._grammar is None:
+            return None
+        if self._recognizer is None or not output_text.startswith(self._fed_text):
+            self._recognizer = GrammarRecognizer(self._grammar)
+            self._fed_text = ""
+        try:
+            self._recognizer.feed(output_text[len(self._fed_text):])
+        except ValueError:
+            self._recognizer = None
+            return None
+        self._fed_text = output_text
+        return self._recognizer
+
+    def _grammar_valid_prefix(self, input_ids: List[int], proposal: List[int]) -> List[int]:
+        output_text = self.draft_llm.detokenize(input_ids[self._prompt_length:]).decode("utf-8", errors="ignore")
+        recognizer = self._recognizer_at(output_text)
+        if recognizer is None:
+            return proposal if self._grammar is None else []
+        recognizer = recognizer.copy()
+        valid = []
+        for token in proposal:
+            piece = self.draft_llm.detokenize([token]).decode("utf-8", errors="ignore")
+            try:
+                recognizer.feed(piece)
+            except ValueError:
+                break
+            valid.append(token)
+        return valid
+
+    def __call__(self, input_ids, **kwargs):
+        input_ids = [int(token) for token in input_ids]
+        # Tokens that were appended since the last call and match the last proposal were accepted by the target.
+        if self._last_proposal and len(input_ids) > self._last_input_length:
+            self.accepted += _common_prefix_length(input_ids[self._last_input_length:], self._last_proposal)
+        proposal = []
+        for token in self.draft_llm.generate(input_ids, temp=0.0):
+            proposal.append(int(token))
+            if len(proposal) >= self.num_pred_tokens:
+                break
+        proposal = self._grammar_valid_prefix(input_ids, proposal)
+        self.proposed += len(proposal)
+        self._last_input_length = len(input_ids)
+        self._last_proposal = proposal
+        return _as_token_array(proposal)
+
+
+def attach_draft_model(llm, draft_llm, num_pred_tokens: int = 8) -> GrammarDraftModel:
+    """Use `draft_llm` for speculative decoding in `llm`, works for `Llama` and `FakeLlama`."""
+    llm.draft_model = GrammarDraftModel(draft_llm, num_pred_tokens)
+    return llm.draft_model
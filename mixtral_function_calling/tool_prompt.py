@@ -0,0 +1,92 @@
+"""
+Render tool descriptions for the system prompt in formats of decreasing size, and pick the richest one that fits
+a token budget.
+"""
+import json
+import weakref
+from collections import OrderedDict
+from typing import List, Sequence
+
+from .grammar_generator import generate_text_documentation
+
+# From richest to most terse.
+TOOL_DESCRIPTION_FORMATS = ("json", "compact_json", "text", "signature")
+
+# Per model, since models with different vocabularies count the same text differently.
+_token_count_caches = weakref.WeakKeyDictionary()
+TOKEN_COUNT_CACHE_SIZE = 1024
+
+
+def _type_name(schema: dict) -> str:
+    if "$ref" in schema:
+        return schema["$ref"].rsplit("/", 1)[-1]
+    if "enum" in schema:
+        return "|".join(json.dumps(value) for value in schema["enum"])
+    if "anyOf" in schema:
+        return " | ".join(_type_name(option) for option in schema["anyOf"])
+    if schema.get("type") == "array":
+        return f"list[{_type_name(schema.get('items', {}))}]"
+    return schema.get("type", "any")
+
+
+def render_signature(function) -> str:
+    """One line per tool: `name(field: type, optional?: type) - first line of the description`."""
+    schema = function.openapi_json
+    parameters = schema.get("parameters", {})
+    required = set(parameters.get("required", []))
+    arguments = ", ".join(
+        f"{name}{'' if name in required else '?'}: {_type_name(field)}"
+        for name, field in parameters.get("properties", {}).items()
+    )
+    description = (schema.get("description") or "").strip().split("\n")[0]
+    return f"{schema['name']}({arguments})" + (f" - {description}" if description else "")
+
+
+def render_tool_description(function, format: str = "json") -> str:
+    if format == "json":
+        return json.dumps(function.openapi_json, indent=4)
+    elif format == "compact_json":
+        return json.dumps(function.openapi_json, separators=(",", ":"))
+    elif format == "text":
+        if getattr(function, "parameters_openapi", None) is None:
+            # Tools given as JSON Schema have no model to document, the signature is their terse format.
+            return render_signature(function)
+        return generate_text_documentation([function.parameters_openapi]).rstrip("\n")
+    elif format == "signature":
+        return render_signature(function)
+    raise ValueError(f"Unknown tool description format: {format}")
+
+
+def render_tool_descriptions(functions: Sequence, format: str = "json") -> str:
+    return "".join(f"{render_tool_description(function, format)}\n" for function in functions)
+
+
+def count_tokens(llm, text: str) -> int:
+    """Token count of `text` with the model's own tokenizer, memoized per model and text."""
+    cache = _token_count_caches.get(llm)
+    if cache is None:
+        cache = _token_count_caches[llm] = OrderedDict()
+    if text in cache:
+        cache.move_to_end(text)
+        return cache[text]
+    count = len(llm.tokenize(text.encode("utf-8"), add_bos=False))
+    cache[text] = count
+    if len(cache) > TOKEN_COUNT_CACHE_SIZE:
+        cache.popitem(last=False)
+    return count
+
+
+def fit_tool_descriptions(functions: Sequence, llm, token_budget: int,
+                          formats: List[str] = TOOL_DESCRIPTION_FORMATS):
+    """
+    Render the tools in the richest of `formats` whose token count fits `token_budget`.
+
+    :return: Tuple of the rendered descriptions, the chosen format and its token count. If no format fits,
+        the last (most terse) one is returned anyway.
+    """
+    for format in formats:
+        rendered = render_tool_descriptions(functions, format)
+        tokens = count_tokens(llm, rendered)
+        if tokens <= token_budget:
+            break
+    return rendered, format, tokens
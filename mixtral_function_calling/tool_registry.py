@@ -0,0 +1,244 @@
+"""
+A registry of Pydantic tools that follows their source files, so that tools can be added and changed without
+restarting the process (and reloading the model).
+
+The registry watches modules or directories of tool definitions. When a file changes, it is imported again in a
+background thread, the grammar fragments and documentation of the models whose schema changed are regenerated, the
+grammar is compiled and the new snapshot is swapped in with a single assignment. A request uses the snapshot it
+started with, so in-flight generations keep their grammar.
+
+A module exposes the models listed in its `__tools__`, or else every Pydantic model defined in it.
+"""
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+from .completion import PydanticFunction, function_call_completion
+from .documentation import get_renderer
+from .grammar_generator import (format_model_and_field_name, format_root_rules, generate_gbnf_grammar,
+                                get_primitive_grammar, pool_rules)
+from .metrics import DEFAULT_METRICS
+
+
+@dataclass(frozen=True)
+class ToolFragment:
+    """The grammar rules and documentation of one model, reused as long as its schema does not change."""
+    rules: Tuple[str, ...]
+    documentation: str
+
+
+@dataclass(frozen=True)
+class ToolSnapshot:
+    version: int
+    models: Tuple[Type[BaseModel], ...]
+    functions: Tuple[PydanticFunction, ...]
+    grammar_text: str
+    documentation: str
+    grammar: object = None  # Compiled with the registry's grammar factory, if it has one
+    fragments: Dict[str, ToolFragment] = field(default_factory=dict)
+
+
+def schema_fingerprint(model: Type[BaseModel]) -> str:
+    schema = json.dumps([model.__name__, model.__doc__, model.model_json_schema()], sort_keys=True)
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+def module_tools(module) -> List[Type[BaseModel]]:
+    tools = getattr(module, "__tools__", None)
+    if tools is not None:
+        return list(tools)
+    return [value for value in vars(module).values()
+            if isinstance(value, type) and issubclass(value, BaseModel) and value is not BaseModel
+            and value.__module__ == module.__name__]
+
+
+def combine_fragments(models: Sequence[Type[BaseModel]], fragments: Sequence[ToolFragment],
+                      root_rule_class: str = None, root_rule_content: str = None) -> str:
+    """
+    Join the fragments into one grammar, emitting rules shared by several models (nested models, enums) once.
+
+    :raises ValueError: If two models define a rule of the same name differently, e.g. two modules define
+        different models of the same name.
+    """
+    model_rule_names = [format_model_and_field_name(model.__name__) for model in models]
+    rules = pool_rules([rule for fragment in fragments for rule in fragment.rules], {})
+    grammar_text = "\n".join([format_root_rules(model_rule_names, root_rule_class, root_rule_content), *rules])
+    return grammar_text + get_primitive_grammar(grammar_text)
+
+
+class ToolRegistry:
+    """
+    :param sources: Module names (e.g. `my_agent.tools`) or paths of directories or files with tool definitions.
+    :param grammar_factory: Compiles the grammar in the background, e.g. `LlamaGrammar.from_string`. Without it,
+        `function_call_completion` compiles (and caches) the grammar on first use.
+    :param poll_interval: Seconds between checks for changed files once `start` was called.
+    :param on_error: Called with the exception when a reload fails, e.g. because two tools define conflicting
+        grammar rules; the previous snapshot stays active.
+
+    Example Usage:
+    ```
+    registry = ToolRegistry(["my_agent.tools"], grammar_factory=LlamaGrammar.from_string).start()
+    response = registry.completion(llm, messages)
+    ```
+    """
+
+    def __init__(self, sources: Sequence[str], grammar_factory: Optional[Callable] = None,
+                 root_rule_class: str = None, root_rule_content: str = None, poll_interval: float = 1.0,
+                 on_error: Optional[Callable[[Exception], None]] = None, metrics=None):
+        self.sources = list(sources)
+        self.grammar_factory = grammar_factory
+        self.root_rule_class = root_rule_class
+        self.root_rule_content = root_rule_content
+        self.poll_interval = poll_interval
+        self.on_error = on_error
+        self.metrics = metrics or DEFAULT_METRICS
+        self.last_error: Optional[Exception] = None
+        self._modules = {}  # path -> (mtime, module)
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.snapshot: Optional[ToolSnapshot] = None
+        self.reload()
+        if self.last_error is not None:
+            raise self.last_error
+
+    def _source_files(self) -> List[Tuple[str, Optional[str]]]:
+        """(path, module name) of every watched file; the module name is None for files loaded by path."""
+        files = []
+        for source in self.sources:
+            if os.path.isdir(source):
+                files.extend((os.path.join(source, name), None) for name in sorted(os.listdir(source))
+                             if name.endswith(".py") and not name.startswith("_"))
+            elif os.path.isfile(source):
+                files.append((source, None))
+            else:
+                spec = importlib.util.find_spec(source)
+                if spec is None or spec.origin is None:
+                    raise ModuleNotFoundError(f"No module named {source!r}")
+                files.append((spec.origin, source))
+        return files
+
+    def _load(self, path: str, module_name: Optional[str], previous):
+        if module_name is not None:
+            module = sys.modules.get(module_name)
+            return importlib.reload(module) if module is not None and previous is not None \
+                else importlib.import_module(module_name)
+        module_name = "_tool_registry_" + hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        # Registered before execution, so that Pydantic can resolve forward references within the module.
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        return module
+
+    def reload(self) -> bool:
+        """
+        Re-import the changed files and swap in a new snapshot if any tool changed.
+
+        :return: Whether a new snapshot was activated.
+        """
+        with self._reload_lock:
+            try:
+                swapped = self._reload()
+            except Exception as exception:
+                self.last_error = exception
+                self.metrics.increment("tool_registry_errors_total")
+                if self.on_error is not None:
+                    self.on_error(exception)
+                return False
+            self.last_error = None
+            return swapped
+
+    def _reload(self) -> bool:
+        modules = {}
+        changed_files = False
+        for path, module_name in self._source_files():
+            mtime = os.stat(path).st_mtime_ns
+            previous = self._modules.get(path)
+            if previous is not None and previous[0] == mtime:
+                modules[path] = previous
+                continue
+            modules[path] = (mtime, self._load(path, module_name, previous))
+            changed_files = True
+        changed_files |= set(modules) != set(self._modules)
+        if not changed_files and self.snapshot is not None:
+            return False
+
+        with self.metrics.stage("tool_registry_reload"):
+            models = [model for _, module in modules.values() for model in module_tools(module)]
+            old_fragments = self.snapshot.fragments if self.snapshot is not None else {}
+            fragments = {}
+            for model in models:
+                fingerprint = schema_fingerprint(model)
+                fragment = old_fragments.get(fingerprint)
+                if fragment is None:
+                    self.metrics.increment("tool_registry_recompiled_models_total")
+                    fragment = ToolFragment(rules=tuple(generate_gbnf_grammar(model, set(), {})),
+                                            documentation=get_renderer().render([model]))
+                fragments[fingerprint] = fragment
+            fingerprints = [schema_fingerprint(model) for model in models]
+            ordered_fragments = [fragments[fingerprint] for fingerprint in fingerprints]
+            grammar_text = combine_fragments(models, ordered_fragments, self.root_rule_class,
+                                             self.root_rule_content)
+            same_grammar = self.snapshot is not None and grammar_text == self.snapshot.grammar_text
+            # Docstrings and descriptions change the fingerprints and the documentation but not the grammar.
+            if same_grammar and fingerprints == [schema_fingerprint(model) for model in self.snapshot.models]:
+                self._modules = modules
+                return False
+            if same_grammar:
+                grammar = self.snapshot.grammar
+            else:
+                grammar = self.grammar_factory(grammar_text) if self.grammar_factory is not None else None
+            snapshot = ToolSnapshot(
+                version=self.snapshot.version + 1 if self.snapshot is not None else 1,
+                models=tuple(models),
+                functions=tuple(PydanticFunction(model) for model in models),
+                grammar_text=grammar_text,
+                documentation="".join(fragment.documentation for fragment in ordered_fragments),
+                grammar=grammar,
+                fragments=fragments,
+            )
+        self._modules = modules
+        self.snapshot = snapshot
+        self.metrics.set_gauge("tool_registry_version", snapshot.version)
+        return True
+
+    def start(self) -> "ToolRegistry":
+        """Poll the sources for changes in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="tool-registry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
+
+    def completion(self, llm, messages, **kwargs):
+        """
+        `function_call_completion` with the tools and grammar of the current snapshot. The grammar covers all tools,
+        so tool selection (`tool_index`, `top_k`) is not supported.
+        """
+        unsupported = sorted({"tool_index", "top_k", "grammar_text", "grammar"} & set(kwargs))
+        if unsupported:
+            raise TypeError(f"ToolRegistry.completion does not support {', '.join(unsupported)}, the grammar of the "
+                            f"snapshot covers all tools")
+        snapshot = self.snapshot
+        return function_call_completion(llm, messages, list(snapshot.functions), grammar_text=snapshot.grammar_text,
+                                        grammar=snapshot.grammar,
+                                        grammar_factory=kwargs.pop("grammar_factory", self.grammar_factory), **kwargs)
@@ -0,0 +1,124 @@
+"""
+Rank tools against the conversation and keep only the most relevant ones, so that both the prompt and the grammar
+only contain the top-k tools.
+"""
+import math
+import re
+from collections import Counter
+from typing import Callable, List, Optional, Sequence
+
+from .grammar_generator import generate_text_documentation
+
+
+def tokenize_words(text: str) -> List[str]:
+    """Lowercase word tokens, with CamelCase and snake_case identifiers split into their parts."""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def tool_document(function) -> str:
+    """The text a tool is indexed by: its name, description and the documentation of its fields."""
+    schema = getattr(function, "openapi_json", {}) or {}
+    parts = [schema.get("name", ""), schema.get("description", "")]
+    parameters = getattr(function, "parameters_openapi", None)
+    if parameters is not None:
+        parts.append(generate_text_documentation([parameters]))
+    return "\n".join(part for part in parts if part)
+
+
+def conversation_query(messages: Sequence[dict], last_n: int = 3) -> str:
+    """The query is built from the most recent non-system messages."""
+    recent = [m for m in messages if m["role"] != "system"][-last_n:]
+    return "\n".join(m.get("content") or "" for m in recent)
+
+
+class ToolIndex:
+    """
+    Base class of the tool indexes: ranks the indexed tools against the conversation by `scores` and selects the
+    most relevant ones.
+    """
+
+    def __init__(self, functions: Sequence):
+        self.functions = list(functions)
+        self._positions = {function.name: i for i, function in enumerate(self.functions)}
+
+    def scores(self, query: str) -> List[float]:
+        raise NotImplementedError
+
+    def select(self, messages: Sequence[dict], top_k: int, functions: Optional[Sequence] = None) -> list:
+        """
+        The `top_k` most relevant of `functions` (default: all indexed tools) for the conversation, in their
+        original order so that the generated grammar (and its cache entry) is the same whenever the same subset is
+        selected. Tools are matched to the index by name.
+
+        :raises ValueError: If one of `functions` is not in the index.
+        """
+        functions = list(self.functions if functions is None else functions)
+        missing = [function.name for function in functions if function.name not in self._positions]
+        if missing:
+            raise ValueError(f"Tools missing from the index: {', '.join(missing)}")
+        if top_k >= len(functions):
+            return functions
+        scores = self.scores(conversation_query(messages))
+        function_scores = [scores[self._positions[function.name]] for function in functions]
+        ranked = sorted(range(len(functions)), key=lambda i: function_scores[i], reverse=True)[:top_k]
+        return [functions[i] for i in sorted(ranked)]
+
+
+class BM25ToolIndex(ToolIndex):
+    """
+    Okapi BM25 index over tool documentation. Built once per tool set, ranking a query is a dictionary lookup
+    per query term and tool.
+    """
+
+    def __init__(self, functions: Sequence, k1: float = 1.5, b: float = 0.75):
+        super().__init__(functions)
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(tokenize_words(tool_document(f))) for f in self.functions]
+        self.lengths = [sum(tf.values()) for tf in self.term_frequencies]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for tf in self.term_frequencies for term in tf)
+        n = len(self.functions)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query: str) -> List[float]:
+        terms = [term for term in tokenize_words(query) if term in self.idf]
+        scores = []
+        for tf, length in zip(self.term_frequencies, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            for term in terms:
+                frequency = tf.get(term, 0)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            scores.append(score)
+        return scores
+
+
+class EmbeddingToolIndex(ToolIndex):
+    """
+    Rank tools by cosine similarity between embeddings. `embed` maps a text to a vector, tool embeddings are
+    computed once and cached on the index.
+    """
+
+    def __init__(self, functions: Sequence, embed: Callable[[str], Sequence[float]]):
+        super().__init__(functions)
+        self.embed = embed
+        self.embeddings = [self._normalize(embed(tool_document(f))) for f in self.functions]
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def scores(self, query: str) -> List[float]:
+        query_embedding = self._normalize(self.embed(query))
+        return [sum(a * b for a, b in zip(query_embedding, e)) for e in self.embeddings]
+
+
+def select_tools(messages: Sequence[dict], functions: Sequence, top_k: int,
+                 index: Optional[ToolIndex] = None) -> list:
+    """Convenience wrapper that builds a BM25 index when none is given. Reuse an index across requests."""
+    index = index or BM25ToolIndex(functions)
+    return index.select(messages, top_k, functions)
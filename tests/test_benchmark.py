@@ -0,0 +1,22 @@
+import weakref
+
+from mixtral_function_calling.backends import FakeBackend
+from mixtral_function_calling.benchmark import backend_workload, compare_backends, resident_memory
+
+
+def test_backends_are_created_one_at_a_time():
+    live = weakref.WeakSet()
+
+    def create_backend():
+        # The model of the previous backend has to be released before the next one is loaded.
+        assert len(live) == 0
+        backend = FakeBackend()
+        live.add(backend)
+        return backend
+
+    workload = dict(list(backend_workload().items())[:1])
+    results = compare_backends({"first": create_backend, "second": create_backend}, workload, samples=1)
+    assert set(results) == {"first", "second"}
+    assert all(result["validity_rate"] == 1.0 for result in results.values())
+    if resident_memory() is not None:
+        assert all(result["rss_increase_mb"] >= 0 for result in results.values())
@@ -0,0 +1,30 @@
+import copy
+
+from mixtral_function_calling.completion import PydanticFunction, chat_template_format, function_call_completion
+from mixtral_function_calling.examples import SendMessageToUser
+from mixtral_function_calling.fake_llama import FakeGrammar, FakeLlama
+
+FUNCTIONS = [PydanticFunction(SendMessageToUser)]
+
+
+def conversation():
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": "Say hello."},
+    ]
+
+
+def test_chat_template_format_does_not_modify_messages():
+    messages = conversation()
+    expected = copy.deepcopy(messages)
+    first = chat_template_format(messages, FUNCTIONS)
+    assert messages == expected
+    assert chat_template_format(messages, FUNCTIONS) == first
+    assert "You have access to the following functions" in first
+
+
+def test_completion_does_not_modify_messages():
+    messages = conversation()
+    expected = copy.deepcopy(messages)
+    function_call_completion(FakeLlama(), messages, FUNCTIONS, grammar_factory=FakeGrammar.from_string)
+    assert messages == expected
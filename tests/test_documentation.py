@@ -0,0 +1,33 @@
+import gc
+import weakref
+
+from pydantic import BaseModel
+
+from mixtral_function_calling.documentation import DocumentationRenderer
+from mixtral_function_calling.grammar_generator import get_model_fields, get_reachable_models
+
+
+def test_dropped_models_are_garbage_collected():
+    renderer = DocumentationRenderer()
+
+    def define_models():
+        class Child(BaseModel):
+            value: int
+
+        class Parent(BaseModel):
+            name: str
+            child: Child
+
+        return Parent, Child
+
+    parent, child = define_models()
+    # The fields of the child are documented inline, nested inside the parent.
+    assert "value (int)" in renderer.render([parent, child])
+    dropped = weakref.WeakSet([parent, child])
+    del parent, child
+    # The reflection caches are bounded LRUs that hold their models, only the renderer's own caches are under test.
+    get_model_fields.cache_clear()
+    get_reachable_models.cache_clear()
+    gc.collect()
+    assert len(dropped) == 0
+
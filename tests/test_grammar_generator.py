@@ -0,0 +1,117 @@
+from enum import Enum
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel, Field, create_model
+
+from mixtral_function_calling.grammar_generator import (generate_gbnf_grammar_from_pydantic, get_primitive_grammar,
+                                                        pool_rules)
+from mixtral_function_calling.grammar_recognizer import GrammarRecognizer, ParsedGrammar
+from mixtral_function_calling.json_schema_grammar import generate_gbnf_grammar_from_json_schemas
+
+
+class Bounded(BaseModel):
+    age: int = Field(ge=0, le=120)
+    count: int = Field(le=5)
+    ratio: float = Field(le=5)
+    percent: int = Field(gt=0, lt=100)
+    price: float = Field(gt=10, lt=1000)
+
+
+def rules(grammar_text):
+    return dict(line.split(" ::= ", 1) for line in grammar_text.splitlines() if " ::= " in line)
+
+
+def test_bounded_numbers_need_a_digit():
+    grammar = rules(generate_gbnf_grammar_from_pydantic([Bounded]))
+    assert grammar["integer-max3"] == "[0-9] [0-9]? [0-9]?"
+    assert grammar["integer-max1"] == "[0-9]"
+    assert grammar["integer-part-max1"] == "[0-9]"
+    assert '"\\"percent\\"" ":" ws integer-max3 ' in grammar["bounded"]
+    assert grammar["float-4-2-X-X"] == 'integer-part-max4-min2 "." fractional-part'
+
+
+def test_json_schema_numbers_match_pydantic():
+    schema = {"name": "Bounded", "parameters": Bounded.model_json_schema()}
+    assert "exclusiveMaximum" in schema["parameters"]["properties"]["percent"]
+    assert generate_gbnf_grammar_from_json_schemas([schema]) == generate_gbnf_grammar_from_pydantic([Bounded])
+
+
+def make_status_model(model_name, values):
+    status = Enum("Status", {value.upper(): value for value in values})
+    return create_model(model_name, status=(status, ...))
+
+
+def test_enums_with_the_same_name_do_not_collide():
+    first = make_status_model("First", ["open", "closed"])
+    second = make_status_model("Second", ["draft", "published"])
+    grammar = rules(generate_gbnf_grammar_from_pydantic([first, second]))
+    enum_rules = {name: rule for name, rule in grammar.items() if name.startswith("enum-status")}
+    assert len(enum_rules) == 2
+    assert sorted(enum_rules.values()) == sorted(['"\\"open\\"" | "\\"closed\\""', '"\\"draft\\"" | "\\"published\\""'])
+    schemas = [{"name": model.__name__, "parameters": model.model_json_schema()} for model in (first, second)]
+    assert generate_gbnf_grammar_from_json_schemas(schemas) == generate_gbnf_grammar_from_pydantic([first, second])
+
+
+def test_enum_rule_is_shared_across_models():
+    status = Enum("Status", {"OPEN": "open", "CLOSED": "closed"})
+    models = [create_model(f"M{index}", status=(status, ...)) for index in range(3)]
+    grammar = generate_gbnf_grammar_from_pydantic(models)
+    assert sum(line.startswith("enum-status") for line in grammar.splitlines()) == 1
+
+
+def test_pool_rules_rejects_conflicting_definitions():
+    created_rules = {}
+    assert pool_rules(["digits ::= [0-9]"], created_rules) == ["digits ::= [0-9]"]
+    assert pool_rules(["digits ::= [0-9]"], created_rules) == []
+    with pytest.raises(ValueError):
+        pool_rules(["digits ::= [0-9]+"], created_rules)
+
+
+def test_models_with_the_same_rule_name_are_rejected():
+    paint = create_model("Color", pigment=(str, ...))
+    light = create_model("Color", wavelength=(int, ...))
+    with pytest.raises(ValueError):
+        generate_gbnf_grammar_from_pydantic([paint, light])
+    tools = [{"name": name, "parameters": {"type": "object", "properties": {"city": {"type": "string"}}}}
+             for name in ("get_weather", "get-weather")]
+    with pytest.raises(ValueError):
+        generate_gbnf_grammar_from_json_schemas(tools)
+
+
+class Node(BaseModel):
+    value: int
+    next: Optional["Node"] = None
+
+
+def accepts(grammar_text, text):
+    recognizer = GrammarRecognizer(ParsedGrammar.from_string(grammar_text + get_primitive_grammar(grammar_text)))
+    try:
+        recognizer.feed(text)
+    except ValueError:
+        return False
+    return recognizer.can_stop()
+
+
+def test_optional_recursive_field_accepts_null():
+    grammar = generate_gbnf_grammar_from_pydantic([Node])
+    # The grammar's `ws` is at least one whitespace character.
+    assert accepts(grammar, '{ "value": 1 ,  "next": { "value": 2 ,  "next": null } }')
+    assert not accepts(grammar, '{ "value": 1 ,  "next":  }')
+    schema = {"name": "Node", "parameters": Node.model_json_schema()}
+    assert generate_gbnf_grammar_from_json_schemas([schema]) == grammar
+
+
+class Settings(BaseModel):
+    verbose: bool = False
+    name: str
+    retries: Optional[int] = None
+
+
+def test_fields_with_defaults_can_be_left_out():
+    grammar = generate_gbnf_grammar_from_pydantic([Settings])
+    assert accepts(grammar, '{ "name": "x" }')
+    assert accepts(grammar, '{ "verbose": true ,  "name": "x" ,  "retries": 2 }')
+    assert not accepts(grammar, '{ "verbose": true }')
+    schema = {"name": "Settings", "parameters": Settings.model_json_schema()}
+    assert generate_gbnf_grammar_from_json_schemas([schema]) == grammar
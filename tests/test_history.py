@@ -0,0 +1,25 @@
+from mixtral_function_calling.completion import PydanticFunction, function_call_completion
+from mixtral_function_calling.examples import YourModel
+from mixtral_function_calling.fake_llama import FakeGrammar, FakeLlama
+from mixtral_function_calling.history import HistoryManager
+
+TOKEN_BUDGET = 3000
+
+
+def long_conversation(turns):
+    messages = [{"role": "system", "content": "You are helpful."}]
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"step {turn} please"})
+        messages.append({"role": "assistant", "content": "", "function_call": {"x": turn}})
+        messages.append({"role": "function", "content": "output line\n" * 80})
+    return messages + [{"role": "user", "content": "go"}]
+
+
+def test_budget_includes_the_tool_descriptions():
+    llm = FakeLlama(seed=1)
+    history = HistoryManager(llm, token_budget=TOKEN_BUDGET, keep_recent=4)
+    function_call_completion(llm, long_conversation(12), [PydanticFunction(YourModel)],
+                             grammar_factory=FakeGrammar.from_string, history=history)
+    assert history.folded_messages > 0
+    # Only the assistant header the completion starts with is rendered on top of the folded history.
+    assert llm.last_stats.prompt_tokens <= TOKEN_BUDGET
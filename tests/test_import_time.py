@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+# Generous, so that slow CI machines pass; importing pydantic alone takes several times longer than the package.
+IMPORT_SECONDS_LIMIT = 0.5
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import mixtral_function_calling
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+def test_import_is_lazy_and_fast():
+    # A fresh interpreter, since the other tests have already imported pydantic.
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    probe = json.loads(output)
+    heavy = [name for name in probe["modules"] if name.split(".")[0] in ("pydantic", "llama_cpp")]
+    assert heavy == []
+    assert probe["seconds"] < IMPORT_SECONDS_LIMIT
+
+
+def test_attribute_access_imports_the_submodule():
+    import mixtral_function_calling
+    assert mixtral_function_calling.PydanticFunction.__module__ == "mixtral_function_calling.completion"
@@ -0,0 +1,56 @@
+from mixtral_function_calling.metrics import Metrics
+
+
+def test_prometheus_counters_and_gauges():
+    metrics = Metrics(prefix="test")
+    metrics.increment("requests_total")
+    metrics.increment("requests_total", 2)
+    metrics.increment("calls_total", labels={"valid": "true"})
+    metrics.set_gauge("grammar_size_bytes", 10)
+    metrics.set_gauge("grammar_size_bytes", 42)
+    lines = metrics.to_prometheus().splitlines()
+    assert "# TYPE test_requests_total counter" in lines
+    assert "test_requests_total 3" in lines
+    assert 'test_calls_total{valid="true"} 1' in lines
+    assert "# TYPE test_grammar_size_bytes gauge" in lines
+    assert "test_grammar_size_bytes 42" in lines
+
+
+def test_prometheus_labelled_histogram():
+    metrics = Metrics(prefix="test")
+    metrics.observe("tokens", 3, {"stage": "decode"}, buckets=(1, 5, 10))
+    metrics.observe("tokens", 7, {"stage": "decode"})
+    lines = metrics.to_prometheus().splitlines()
+    assert "# TYPE test_tokens histogram" in lines
+    assert 'test_tokens_bucket{stage="decode",le="1"} 0' in lines
+    assert 'test_tokens_bucket{stage="decode",le="5"} 1' in lines
+    assert 'test_tokens_bucket{stage="decode",le="10"} 2' in lines
+    assert 'test_tokens_bucket{stage="decode",le="+Inf"} 2' in lines
+    assert 'test_tokens_sum{stage="decode"} 10.0' in lines
+    assert 'test_tokens_count{stage="decode"} 2' in lines
+
+
+def test_callbacks_see_every_observation():
+    seen = []
+    metrics = Metrics(callbacks=[lambda *event: seen.append(event)])
+    metrics.add_callback(lambda *event: seen.append(("second",) + event))
+    metrics.increment("hits_total", labels={"cache": "grammar"})
+    metrics.set_gauge("size", 5)
+    with metrics.stage("parsing"):
+        pass
+    assert seen[0] == ("counter", "hits_total", 1, {"cache": "grammar"})
+    assert seen[1] == ("second", "counter", "hits_total", 1, {"cache": "grammar"})
+    assert seen[2] == ("gauge", "size", 5, {})
+    assert seen[4][:2] == ("histogram", "stage_seconds") and seen[4][3] == {"stage": "parsing"}
+    assert metrics.stage_mean("parsing") >= 0
+
+
+def test_hit_rate():
+    metrics = Metrics()
+    assert metrics.hit_rate("grammar") == 0.0
+    metrics.record_cache("grammar", True)
+    metrics.record_cache("grammar", True)
+    metrics.record_cache("grammar", False)
+    metrics.record_cache("response", False)
+    assert metrics.hit_rate("grammar") == 2 / 3
+    assert metrics.hit_rate("response") == 0.0
@@ -0,0 +1,61 @@
+import os
+
+from mixtral_function_calling import response_cache
+from mixtral_function_calling.response_cache import ResponseCache
+
+COMPLETION = {"text": '{"function": "send_message"}', "finish_reason": "stop"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    cache = ResponseCache(ttl_seconds=10)
+    cache.put("key", COMPLETION)
+    clock.now += 5
+    assert cache.get("key") == COMPLETION
+    clock.now += 10
+    assert cache.get("key") is None
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", COMPLETION)
+    cache.put("b", COMPLETION)
+    cache.get("a")
+    cache.put("c", COMPLETION)
+    assert cache.get("a") == COMPLETION
+    assert cache.get("b") is None
+    assert cache.get("c") == COMPLETION
+
+
+def test_disk_tier_is_shared_and_bounded(tmp_path):
+    writer = ResponseCache(directory=str(tmp_path), max_disk_bytes=10 ** 6)
+    writer.put("a", COMPLETION)
+    assert ResponseCache(directory=str(tmp_path)).get("a") == COMPLETION
+
+    size = os.path.getsize(tmp_path / "a.json")
+    # Room for two entries, the timestamps make their sizes differ by a few bytes.
+    bounded = ResponseCache(max_entries=1, directory=str(tmp_path), max_disk_bytes=2 * size + size // 2)
+    os.utime(tmp_path / "a.json", (0, 0))
+    bounded.put("b", COMPLETION)
+    os.utime(tmp_path / "b.json", (1, 1))
+    bounded.put("c", COMPLETION)
+    assert sorted(os.listdir(tmp_path)) == ["b.json", "c.json"]
+    assert bounded.get("a") is None
+    assert bounded.get("b") == COMPLETION
+
+
+def test_key_ignores_integer_or_float_sampling_values():
+    cache = ResponseCache()
+    assert cache.key("prompt", "root ::= x", {"temperature": 0}) == cache.key("prompt", "root ::= x",
+                                                                              {"temperature": 0.0})
+    assert cache.key("prompt", "root ::= x", {"temperature": 0}) != cache.key("prompt", "root ::= x",
+                                                                              {"temperature": 1})
@@ -0,0 +1,71 @@
+import pytest
+
+from mixtral_function_calling.completion import PydanticFunction, chat_template_format, function_call_completion
+from mixtral_function_calling.examples import SendMessageToUser
+from mixtral_function_calling.fake_llama import FakeGrammar, FakeLlama
+from mixtral_function_calling.session_store import SessionStore
+
+FUNCTIONS = [PydanticFunction(SendMessageToUser)]
+
+
+def complete(llm, messages, store):
+    return function_call_completion(llm, messages, FUNCTIONS, grammar_factory=FakeGrammar.from_string,
+                                    session_store=store, session_id="session")
+
+
+def test_resumed_turn_evaluates_only_new_tokens(tmp_path):
+    store = SessionStore(str(tmp_path))
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": "Say hello."},
+    ]
+    first_turn = FakeLlama(seed=1)
+    response = complete(first_turn, messages, store)
+    previous_turns = first_turn.tokenize(chat_template_format(messages, FUNCTIONS).encode("utf-8"))
+
+    # The same list grows by one turn and the session moves to a new worker.
+    messages += [
+        {"role": "assistant", "content": "", "function_call": response["function_call"].model_dump()},
+        {"role": "user", "content": "Say it again."},
+    ]
+    resumed = FakeLlama(seed=2)
+    complete(resumed, messages, store)
+    # Everything up to the new turn comes from the restored snapshot.
+    assert resumed.last_stats.cached_prompt_tokens >= len(previous_turns)
+
+
+class RecordingLlama(FakeLlama):
+    """Keeps the state it was restored from, to check what a real `Llama.load_state` would get."""
+
+    def load_state(self, state):
+        self.loaded_state = state
+        super().load_state(state)
+
+
+def saved_session(tmp_path):
+    store = SessionStore(str(tmp_path))
+    llm = FakeLlama(seed=1, n_ctx=512)
+    complete(llm, [{"role": "user", "content": "Say hello."}], store)
+    return store, list(llm.input_ids)
+
+
+def test_restored_input_ids_fill_the_context(tmp_path):
+    store, saved_tokens = saved_session(tmp_path)
+    llm = RecordingLlama(n_ctx=512)
+    store.restore("session", llm)
+    input_ids = llm.loaded_state.input_ids
+    assert len(input_ids) == 512
+    assert list(input_ids[:len(saved_tokens)]) == saved_tokens
+    assert llm.input_ids == saved_tokens
+
+
+def test_numpy_state_matches_the_token_ids(tmp_path):
+    np = pytest.importorskip("numpy")
+    store, saved_tokens = saved_session(tmp_path)
+    with store.open("session") as snapshot:
+        state = snapshot.to_state(FakeLlama.state_class, n_ctx=512)
+        assert state.input_ids.dtype == np.intc
+        assert state.input_ids.shape == (512,)
+        assert state.input_ids[:len(saved_tokens)].tolist() == saved_tokens
+        assert not state.input_ids[len(saved_tokens):].any()
+        del state
@@ -0,0 +1,53 @@
+from mixtral_function_calling.completion import PydanticFunction, function_call_completion, generated_tokens
+from mixtral_function_calling.examples import SendMessageToUser
+from mixtral_function_calling.fake_llama import FakeGrammar, FakeLlama
+from mixtral_function_calling.speculative import attach_draft_model
+
+MESSAGES = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "Say hello."},
+]
+
+
+def speculative_completion(draft_seed):
+    llm = FakeLlama(seed=0)
+    draft_model = attach_draft_model(llm, FakeLlama(seed=draft_seed), num_pred_tokens=4)
+    response = function_call_completion(llm, [dict(message) for message in MESSAGES],
+                                        [PydanticFunction(SendMessageToUser)],
+                                        grammar_factory=FakeGrammar.from_string)
+    return llm, draft_model, response
+
+
+def test_identical_draft_is_fully_accepted():
+    # Same seed, so the draft samples the same arguments as the target.
+    llm, draft_model, response = speculative_completion(draft_seed=0)
+    assert response["function_call"] is not None
+    assert draft_model.proposed == draft_model.accepted > 0
+    assert draft_model.stats.acceptance_rate("SendMessageToUser") == 1.0
+
+
+def test_counts_match_the_target_verification():
+    llm, draft_model, _ = speculative_completion(draft_seed=1)
+    assert draft_model.proposed == llm.last_stats.draft_proposed_tokens
+    assert draft_model.accepted == llm.last_stats.draft_accepted_tokens
+    assert draft_model.stats.per_tool["SendMessageToUser"]["completions"] == 1
+
+
+class LeadingSpaceLlama(FakeLlama):
+    """Tokenizes a standalone string with an extra leading token, as SentencePiece models do."""
+    LEADING_SPACE = 29871
+
+    def tokenize(self, text, add_bos=True, special=False):
+        tokens = super().tokenize(text, add_bos=add_bos, special=special)
+        return tokens if add_bos else [self.LEADING_SPACE] + tokens
+
+
+def test_generated_tokens_are_the_sampled_ones():
+    llm = LeadingSpaceLlama(script=['{"message": "hi"}'])
+    prompt_tokens = llm.tokenize(b"prompt")
+    text = llm(prompt_tokens, max_tokens=-1)["choices"][0]["text"]
+    sampled = llm.input_ids[len(prompt_tokens):]
+    assert generated_tokens(llm, prompt_tokens, text, "stop") == sampled + [llm.token_eos()]
+    # Cut at max_tokens, llama.cpp has not evaluated the last sampled token.
+    llm.input_ids = llm.input_ids[:-1]
+    assert generated_tokens(llm, prompt_tokens, text, "length") == sampled
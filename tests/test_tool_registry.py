@@ -0,0 +1,69 @@
+import os
+import textwrap
+
+import pytest
+
+from mixtral_function_calling.fake_llama import FakeGrammar, FakeLlama
+from mixtral_function_calling.tool_registry import ToolRegistry
+
+
+def write_tool(directory, file_name, source):
+    (directory / file_name).write_text(textwrap.dedent(source))
+
+
+def test_conflicting_rules_keep_the_previous_snapshot(tmp_path):
+    write_tool(tmp_path, "paint.py", """
+        from pydantic import BaseModel
+
+        class Color(BaseModel):
+            name: str
+    """)
+    errors = []
+    registry = ToolRegistry([str(tmp_path)], grammar_factory=FakeGrammar.from_string, on_error=errors.append)
+    snapshot = registry.snapshot
+
+    write_tool(tmp_path, "light.py", """
+        from pydantic import BaseModel
+
+        class Color(BaseModel):
+            wavelength: float
+    """)
+    assert not registry.reload()
+    assert isinstance(registry.last_error, ValueError)
+    assert errors == [registry.last_error]
+    assert registry.snapshot is snapshot
+
+
+def test_completion_rejects_tool_selection(tmp_path):
+    write_tool(tmp_path, "paint.py", """
+        from pydantic import BaseModel
+
+        class Color(BaseModel):
+            name: str
+    """)
+    registry = ToolRegistry([str(tmp_path)], grammar_factory=FakeGrammar.from_string)
+    messages = [{"role": "user", "content": "Pick a color."}]
+    with pytest.raises(TypeError):
+        registry.completion(FakeLlama(), messages, top_k=1)
+    assert registry.completion(FakeLlama(), messages)["function_call"].name
+
+
+def test_description_change_swaps_the_snapshot(tmp_path):
+    source = """
+        from pydantic import BaseModel, Field
+
+        class Color(BaseModel):
+            name: str = Field(..., description="{description}")
+    """
+    write_tool(tmp_path, "paint.py", source.format(description="Name of the paint."))
+    registry = ToolRegistry([str(tmp_path)], grammar_factory=FakeGrammar.from_string)
+    snapshot = registry.snapshot
+
+    write_tool(tmp_path, "paint.py", source.format(description="Name of the color."))
+    os.utime(tmp_path / "paint.py", ns=(0, 0))
+    assert registry.reload()
+    assert registry.snapshot.grammar_text == snapshot.grammar_text
+    assert registry.snapshot.grammar is snapshot.grammar
+    assert "Name of the color." in registry.snapshot.documentation
+    assert "Name of the color." in str(registry.snapshot.functions[0].openapi_json)
+    assert not registry.reload()
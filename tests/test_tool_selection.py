@@ -0,0 +1,60 @@
+import pytest
+
+from mixtral_function_calling.completion import PydanticFunction
+from mixtral_function_calling.examples import (FileListModel, ReadFileModel, SendMessageToUser, WebBrowsingModel,
+                                               WriteFileSectionModel)
+from mixtral_function_calling.tool_selection import (BM25ToolIndex, EmbeddingToolIndex, select_tools,
+                                                     tokenize_words)
+
+MODELS = [SendMessageToUser, WebBrowsingModel, ReadFileModel, FileListModel, WriteFileSectionModel]
+
+
+def functions():
+    return [PydanticFunction(model) for model in MODELS]
+
+
+def ask(text):
+    return [{"role": "system", "content": "You are helpful."}, {"role": "user", "content": text}]
+
+
+def test_tokenize_words_splits_identifiers():
+    assert tokenize_words("ReadFileModel file_path") == ["read", "file", "model", "file", "path"]
+
+
+def test_bm25_ranks_the_matching_tool_first():
+    index = BM25ToolIndex(functions())
+    scores = index.scores("browse the web for a website")
+    assert max(range(len(MODELS)), key=scores.__getitem__) == MODELS.index(WebBrowsingModel)
+
+
+def test_selection_keeps_the_original_order():
+    index = BM25ToolIndex(functions())
+    selected = index.select(ask("write a section to the file, then list the folder"), top_k=2)
+    names = [function.name for function in selected]
+    assert names == sorted(names, key=[model.__name__ for model in MODELS].index)
+    assert len(selected) == 2
+
+
+def test_selection_returns_the_functions_passed_in():
+    index = BM25ToolIndex(functions())
+    passed = functions()[2:]
+    selected = index.select(ask("read the file"), top_k=2, functions=passed)
+    assert all(any(function is candidate for candidate in passed) for function in selected)
+    assert select_tools(ask("read the file"), passed, top_k=1)[0] is passed[0]
+
+
+def test_selection_rejects_unindexed_functions():
+    index = BM25ToolIndex(functions()[:2])
+    with pytest.raises(ValueError):
+        index.select(ask("read the file"), top_k=1, functions=functions())
+
+
+def test_embedding_index():
+    vocabulary = ["message", "web", "read", "list", "write"]
+
+    def embed(text):
+        words = tokenize_words(text)
+        return [float(words.count(word)) for word in vocabulary]
+
+    index = EmbeddingToolIndex(functions(), embed)
+    assert [function.name for function in index.select(ask("list it"), top_k=1)] == ["FileListModel"]